@@ -1,5 +1,6 @@
 # create and send signals according to the target location
 import numpy as np
+from pulse_shaping import rrc_taps, PolyphaseInterpolator, MatchedFilter
 
 class Pam:
     def __init__(self):
@@ -28,159 +29,231 @@ class Pam:
         return pam_symbols
 
 
-    def digital_modulation(self, bits: str, N: int):
+    def bits_per_symbol(self, N):
         '''
-        maps bits to symbols
+        Parameters:
+        N (int): Number of PAM levels, must be a power of two.
 
+        Returns:
+        L (int): number of bits carried by each symbol
+        '''
+        if N < 2 or N & (N - 1):
+            raise ValueError("Number of levels must be a power of two.")
+        return N.bit_length() - 1
+
+
+    def bit_table(self, N, gray=False):
+        '''
         Parameters:
-        bits (list): a list of bits representing the audio recording
-        N (int): Number of PAM levels.          should be 4!!               --> 2 bits per symbol
+        N (int): Number of PAM levels.
+        gray (bool): label the levels with a Gray code so neighbours differ in one bit
 
         Returns:
-        res (list): a list of symbols each 8 bits map to
+        table (np.ndarray): (N, log2(N)) uint8 array, row i holds the bits (msb first) of level i
         '''
+        L = self.bits_per_symbol(N)
+        codes = np.arange(N)
+        if gray:
+            codes ^= codes >> 1
+        return np.unpackbits(codes.astype(">u2").view(np.uint8).reshape(N, 2), axis=1)[:, 16 - L:]
 
-        cons = self.pam_constallation(N)
-        res = []
 
-        for i in range(0, len(bits), 2):
-            n = bits[i:i+2]
-            res.append(float(cons[int(n, 2)]))
+    def modulate(self, bits, N, packed=False, gray=False):
+        '''
+        maps bits to symbols without any per-bit python work
 
-        return res
-    
+        Parameters:
+        bits (np.ndarray): either a 0/1 bit array, or a packed np.uint8 byte buffer (msb first)
+        N (int): Number of PAM levels, any power of two.
+        packed (bool): True if bits is a packed byte buffer (bytes / bytearray are always packed)
+        gray (bool): use the Gray coded labelling of bit_table
 
-    def digital_modulation2(self, bits: list, N: int):
+        Returns:
+        symb (np.ndarray): one float PAM level for every log2(N) bits
+        '''
+        L = self.bits_per_symbol(N)
+        if packed or isinstance(bits, (bytes, bytearray)):
+            data = np.frombuffer(bits, dtype=np.uint8) if isinstance(bits, (bytes, bytearray)) \
+                else np.ascontiguousarray(bits, dtype=np.uint8).ravel()
+            bits = np.unpackbits(data)
+        bits = np.asarray(bits, dtype=np.uint8).ravel()
+
+        if bits.size % L:
+            raise ValueError(f"{bits.size} bits cannot be split into {L}-bit symbols for N = {N}.")
+
+        # each row of L bits is one symbol index (msb first)
+        weights = 1 << np.arange(L - 1, -1, -1, dtype=np.intp)
+        index = bits.reshape(-1, L) @ weights
+        if gray:
+            # invert the Gray labelling: level i carries the code i ^ (i >> 1)
+            codes = np.arange(N)
+            index = np.argsort(codes ^ (codes >> 1))[index]
+
+        cons = self.pam_constallation(N)
+        return cons[index]
+
+
+    def digital_modulation(self, bits: str, N: int):
         '''
         maps bits to symbols
 
         Parameters:
-        bits (list): a list of bits representing the audio recording
-        N (int): Number of PAM levels.          should be 4!!
+        bits (str): a string of bits representing the audio recording
+        N (int): Number of PAM levels.
 
         Returns:
-        res (list): a list of symbols each 8 bits map to
+        res (np.ndarray): the symbols each log2(N) bits map to
         '''
+        bits = np.frombuffer(bits.encode("ascii"), dtype=np.uint8) - ord("0")
+        return self.modulate(bits, N)
+    
 
-        cons = self.pam_constallation(N)
-        res = []
-        for num in bits:
-            n1 = num[:len(num)//4]
-            n2 = num[len(num)//4:len(num)//2]
-            n3 = num[len(num)//2:(len(num)//4) *3]
-            n4 = num[(len(num)//4)*3:]
+    def digital_modulation2(self, bits: list, N: int):
+        '''
+        maps bits to symbols
 
-            res.append(float(cons[int(n1, 2)]))
-            res.append(float(cons[int(n2, 2)]))
-            res.append(float(cons[int(n3, 2)]))
-            try:
-                res.append(float(cons[int(n4, 2)]))
-            except: IndexError
+        Parameters:
+        bits (list): a list of 8 bit strings representing the audio recording
+        N (int): Number of PAM levels.
 
-        return res
+        Returns:
+        res (np.ndarray): the symbols each log2(N) bits map to
+        '''
+        return self.digital_modulation("".join(bits), N)
 
 
-    def create_message(self, symbols, K):
+    def create_message(self, symbols, K, rolloff=None, span=8):
         '''
         Parameters:
         symbols: a list of symbols
-        K: number of repeats
+        K: number of repeats (samples per symbol)
+        rolloff (float): if given, shape the symbols with a root raised cosine of this rolloff
+                         instead of square pulses. K = 2 is enough then.
+        span (int): length of the root raised cosine in symbols
+
+        Returns:
+        l (np.ndarray): the samples, len(symbols) * K long for square pulses and
+                        (len(symbols) + span) * K long with the filter tail for root raised cosine
         '''
+        if rolloff is not None:
+            shaper = PolyphaseInterpolator(rrc_taps(K, rolloff, span), K)
+            return np.concatenate((shaper.process(symbols), shaper.flush()))
+
         #make the square wave
         l = np.repeat(symbols, K)
         return l
 
 
-    def decode_message(self, m, K, N):
+    def decode_message(self, m, K, N, offset=None, rolloff=None, span=8):
         '''
         Parameters:
         m: message
         K: number of repeats in m
-        N (int): Number of PAM levels.          should be 4!!
+        N (int): Number of PAM levels.
+        offset (int): if given, take the single sample at this offset inside every symbol
+                      instead of averaging all K of them (integrate and dump)
+        rolloff (float): if given, m was shaped with a root raised cosine (see create_message)
+                         and is decoded with the matched filter instead
+        span (int): length of the root raised cosine in symbols
 
         Returns:
-        symb: the symbols decoded
+        symb (np.ndarray): the symbols decoded, as complex64
         '''
-        symb = []
-        i = 0
-        while i < len(m):
-            symb.append(np.average(np.array(m[i:i+K])))
-            i += K
-        
+        m = np.asarray(m)
+        if rolloff is not None:
+            return MatchedFilter(rrc_taps(K, rolloff, span), K).process(m).astype(np.complex64)
+
+        if offset is not None:
+            if not 0 <= offset < K:
+                raise ValueError("offset must be in the range [0, K).")
+            # strided view, nothing is copied until the dtype conversion
+            return m[offset::K].astype(np.complex64)
+
+        n_full = len(m) // K
+        symb = np.empty(-(-len(m) // K), dtype=np.complex64)
+        symb[:n_full] = m[:n_full * K].reshape(n_full, K).mean(axis=1)
+
+        # a partial last symbol is averaged over the samples that arrived
+        if n_full < len(symb):
+            symb[n_full] = m[n_full * K:].mean()
+
         return symb
 
 
+    def detect_pam_index(self, N, received_symbol):
+        '''
+        Slice received samples to the index of the nearest PAM level.
+
+        The levels are evenly spaced at (2i - N + 1) * d, so the nearest one is found
+        with a single scale, round and clip over the whole array.
+
+        Parameters:
+        N (int): Number of PAM levels.
+        received_symbol (np.ndarray): received samples, only the real part is used
+
+        Returns:
+        idx (np.ndarray): symbol indices in [0, N)
+        '''
+        cons = self.pam_constallation(N)
+        d = cons[1] - cons[0]
+        x = np.real(np.asarray(received_symbol))
+        idx = np.rint((x - cons[0]) / d)
+        return np.clip(idx, 0, N - 1).astype(np.intp)
+
+
     def detect_pam_symbol(self, N, received_symbol):
         """
         Detect the PAM symbol from a received symbol.
 
         Parameters:
-        N (int): Number of PAM levels.          should be 4!!
-        received_symbol (complex): The received symbol to be detected.
+        N (int): Number of PAM levels.
+        received_symbol (np.ndarray): The received symbols to be detected.
 
         Returns:
-        complex: The detected PAM symbol.
+        np.ndarray: The detected PAM symbols.
         """
-        #implement the PAM symbol detection logic
         cons = self.pam_constallation(N)
-        res = []
-        for s in received_symbol:
-            s = np.real(s)
-            dif = np.abs(np.array(cons - s))
-            m = np.argmin(dif)
-            res.append(cons[m])
-        return res
+        return cons[self.detect_pam_index(N, received_symbol)]
 
 
-    def symbol_to_bits(self, N, symbols: list):
+    def symbols_to_bytes(self, N, index, gray=False):
         '''
+        Demap symbol indices (from detect_pam_index) to a packed payload in one gather.
+
         Parameters:
-        N (int): Number of PAM levels.          should be 4!!
-        symbols: recieved symbols
+        N (int): Number of PAM levels.
+        index (np.ndarray): symbol indices in [0, N)
+        gray (bool): the labelling used by modulate
 
         Returns:
-        res (list): corresponding bits to each symbol
+        res (np.ndarray): packed np.uint8 bits, msb first. The last byte is zero padded
+                          when the bit count is not a multiple of 8.
         '''
-        L = int(np.log2(N))
-        zeros = "0" * L
-        cons = self.pam_constallation(N)
-        res = ""
-        i = 0
-        for s in symbols:
-            j = np.where(cons == s)[0][0]
-            b = bin(j)[2:]
-            l = L - len(b)
-            num += zeros[:l]
-            num += b
-            res += num
-            i += 1
-        return res
+        table = self.bit_table(N, gray)
+        return np.packbits(table[np.asarray(index)].ravel())
+
+
+    def symbol_to_bits(self, N, symbols):
+        '''
+        Parameters:
+        N (int): Number of PAM levels.
+        symbols: recieved symbols (constellation points)
+
+        Returns:
+        res (str): the bits of all symbols joined together
+        '''
+        table = self.bit_table(N) + ord("0")
+        return table[self.detect_pam_index(N, symbols)].tobytes().decode("ascii")
 
 
     def symbol_to_bits2(self, N, symbols):
         '''
         Parameters:
-        N (int): Number of PAM levels.          should be 4!!
-        symbols: recieved symbols
+        N (int): Number of PAM levels.
+        symbols: recieved symbols (constellation points)
 
         Returns:
-        res (list): corresponding bits to each symbol
+        res (list): the bits of the symbols as 8 bit strings
         '''
-        L = int(np.log2(N))
-        zeros = "0" * L
-        M = 2**L
-        cons = self.pam_constallation(N)
-        res = []
-        i = 0
-        for s in symbols:
-            if i % 4 == 0:
-                num = ""
-            j = np.where(cons == s)[0][0]
-            b = bin(j)[2:]
-            l = L - len(b)
-            num += zeros[:l]
-            num += b
-            if i % 4 == 3:
-                res.append(num)
-            i += 1
-        return res
+        bits = self.symbol_to_bits(N, symbols)
+        return [bits[i:i + 8] for i in range(0, len(bits) - 7, 8)]
@@ -0,0 +1,153 @@
+# square Gray coded QAM, the quadrature counterpart of PAM.py
+from functools import lru_cache
+import numpy as np
+from PAM import Pam
+
+
+@lru_cache(maxsize=None)
+def _tables(M):
+    '''
+    Everything a square M-QAM modem needs, built once per order.
+
+    Returns:
+    points (np.ndarray): complex64, point i carries label i, unit average power
+    table (np.ndarray): (M, L) uint8, row i holds the bits of label i, msb first
+    byte_lut (np.ndarray): (256, 8 // L) points a packed byte maps to, None if L does not divide 8
+    gray (np.ndarray): Gray code of every PAM level of one axis
+    '''
+    P = Pam()
+    L = P.bits_per_symbol(M)
+    if L % 2:
+        raise ValueError(f"M = {M} is not a square constellation, use 4, 16, 64, 256 or 1024.")
+    m = 1 << (L // 2)
+    levels = P.pam_constallation(m) / np.sqrt(2)
+    codes = np.arange(m)
+    gray = codes ^ (codes >> 1)
+
+    # the high half of a label is the Gray code of the I level, the low half that of the Q level
+    level_of = np.argsort(gray)
+    labels = np.arange(M)
+    points = (levels[level_of[labels >> (L // 2)]] + 1j * levels[level_of[labels & (m - 1)]]).astype(np.complex64)
+    table = ((labels[:, None] >> np.arange(L - 1, -1, -1)) & 1).astype(np.uint8)
+
+    byte_lut = None
+    if 8 % L == 0:
+        per_byte = 8 // L
+        shifts = np.arange(per_byte - 1, -1, -1) * L
+        byte_lut = points[(np.arange(256)[:, None] >> shifts) & (M - 1)]
+
+    # shared by every caller through the cache, so nobody may change them in place
+    for array in (points, table, byte_lut, gray):
+        if array is not None:
+            array.flags.writeable = False
+    return points, table, byte_lut, gray
+
+
+class Qam:
+    def __init__(self):
+        self.P = Pam()
+
+    def qam_constellation(self, M):
+        '''
+        Parameters:
+        M (int): constellation size, 4, 16, 64, 256 or 1024
+
+        Returns:
+        np.ndarray: the M points with unit average power, point i carries the label i. The array
+                    is shared and read-only, copy it before scaling in place.
+        '''
+        return _tables(M)[0]
+
+
+    def bits_per_symbol(self, M):
+        return self.P.bits_per_symbol(M)
+
+
+    def bit_table(self, M):
+        '''
+        Returns:
+        table (np.ndarray): (M, log2(M)) uint8 array, row i holds the bits (msb first) of point i,
+                            e.g. for soft_demap.LlrDemapper
+        '''
+        return _tables(M)[1]
+
+
+    def modulate(self, bits, M, packed=False):
+        '''
+        Parameters:
+        bits (np.ndarray): either a 0/1 bit array, or a packed np.uint8 byte buffer (msb first)
+        M (int): constellation size
+        packed (bool): True if bits is a packed byte buffer (bytes / bytearray are always packed)
+
+        Returns:
+        symb (np.ndarray): one complex64 point for every log2(M) bits. A last partial symbol is
+                           filled with zeros; demodulate's n_bits drops them again.
+        '''
+        points, _, byte_lut, _ = _tables(M)
+        L = self.bits_per_symbol(M)
+        if packed or isinstance(bits, (bytes, bytearray)):
+            data = np.frombuffer(bits, dtype=np.uint8) if isinstance(bits, (bytes, bytearray)) \
+                else np.ascontiguousarray(bits, dtype=np.uint8).ravel()
+            if byte_lut is not None:
+                # 4, 16 and 256-QAM: every byte is a whole number of symbols
+                return byte_lut[data].ravel()
+            bits = np.unpackbits(data)
+        bits = np.asarray(bits, dtype=np.uint8).ravel()
+
+        pad = -bits.size % L
+        if pad:
+            bits = np.concatenate((bits, np.zeros(pad, dtype=np.uint8)))
+        weights = 1 << np.arange(L - 1, -1, -1, dtype=np.intp)
+        return points[bits.reshape(-1, L) @ weights]
+
+
+    def detect_qam_index(self, M, x):
+        '''
+        Nearest point of every received symbol, found by slicing I and Q on their own, O(n) for any M.
+
+        Parameters:
+        M (int): constellation size
+        x (np.ndarray): received complex symbols, gain and phase corrected
+
+        Returns:
+        np.ndarray: label of the nearest point for each symbol
+        '''
+        gray = _tables(M)[3]
+        m = gray.size
+        x = np.asarray(x) * np.sqrt(2)
+        i = self.P.detect_pam_index(m, np.real(x))
+        q = self.P.detect_pam_index(m, np.imag(x))
+        return (gray[i] << (self.bits_per_symbol(M) // 2)) | gray[q]
+
+
+    def detect_qam_symbol(self, M, x):
+        '''
+        Returns:
+        np.ndarray: the nearest constellation point for each received symbol
+        '''
+        return _tables(M)[0][self.detect_qam_index(M, x)]
+
+
+    def slicer(self, M):
+        '''
+        Returns:
+        function mapping received symbols to the nearest points, e.g. for carrier.CarrierRecovery
+        '''
+        return lambda x: self.detect_qam_symbol(M, x)
+
+
+    def demodulate(self, x, M, n_bits=None, packed=False):
+        '''
+        Parameters:
+        x (np.ndarray): received complex symbols, gain and phase corrected
+        M (int): constellation size
+        n_bits (int): bits that were modulated, drops the zeros modulate filled the last symbol with
+        packed (bool): return packed bytes (msb first) instead of a 0/1 array
+
+        Returns:
+        np.ndarray: uint8 bits, or bytes packed into a uint8 array
+        '''
+        bits = self.bit_table(M)[self.detect_qam_index(M, x)].ravel()
+        if n_bits is not None:
+            bits = bits[:n_bits]
+        return np.packbits(bits) if packed else bits
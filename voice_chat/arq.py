@@ -0,0 +1,334 @@
+# link layer: CRC-32 checked frames with selective repeat ARQ, and a lossy loopback to test it on
+import time
+import numpy as np
+
+POLY = 0xEDB88320       # reflected CRC-32 polynomial, the one zlib and Ethernet use
+
+
+def _crc_tables():
+    # slicing by 8: table j advances the CRC over a byte followed by j zero bytes
+    t = np.arange(256, dtype=np.uint32)
+    for _ in range(8):
+        t = np.where(t & 1, (t >> 1) ^ np.uint32(POLY), t >> 1).astype(np.uint32)
+    tables = [t]
+    for _ in range(7):
+        prev = tables[-1]
+        tables.append((prev >> 8) ^ t[prev & 0xFF])
+    return np.array(tables)
+
+
+CRC_TABLES = _crc_tables()
+
+
+def crc32(data):
+    '''
+    CRC-32 of many equal length messages at once, equal to zlib.crc32 of each.
+
+    Eight bytes are folded in per step with the slicing-by-8 tables, for all messages together,
+    so the Python loop runs len / 8 times however many messages there are.
+
+    Parameters:
+    data (bytes | np.ndarray): one message, or a (messages, length) uint8 array
+
+    Returns:
+    int for one message, np.ndarray of uint32 for a 2-D array
+    '''
+    single = isinstance(data, (bytes, bytearray)) or np.ndim(data) == 1
+    d = np.frombuffer(data, dtype=np.uint8) if isinstance(data, (bytes, bytearray)) else np.asarray(data, dtype=np.uint8)
+    d = d.reshape(1, -1) if single else d
+    T = CRC_TABLES
+    crc = np.full(d.shape[0], 0xFFFFFFFF, dtype=np.uint32)
+
+    whole = d.shape[1] - d.shape[1] % 8
+    words = d[:, :whole].reshape(d.shape[0], -1, 8).astype(np.uint32)
+    for i in range(words.shape[1]):
+        w = words[:, i]
+        c = crc ^ (w[:, 0] | (w[:, 1] << 8) | (w[:, 2] << 16) | (w[:, 3] << 24))
+        crc = (T[7][c & 0xFF] ^ T[6][(c >> 8) & 0xFF] ^ T[5][(c >> 16) & 0xFF] ^ T[4][c >> 24]
+               ^ T[3][w[:, 4]] ^ T[2][w[:, 5]] ^ T[1][w[:, 6]] ^ T[0][w[:, 7]])
+    for i in range(whole, d.shape[1]):
+        crc = T[0][(crc ^ d[:, i]) & 0xFF] ^ (crc >> 8)
+
+    crc ^= np.uint32(0xFFFFFFFF)
+    return int(crc[0]) if single else crc
+
+
+# frame: seq (2 bytes) | payload length (2 bytes) | flags (1 byte) | payload | CRC-32 of everything before it
+HEADER = 5
+LAST = 1        # flag of the frame that ends the message
+
+
+def build_frames(data, frame_size=1000):
+    '''
+    Parameters:
+    data (bytes | np.ndarray): the message
+    frame_size (int): payload bytes per frame, the last frame is zero padded to the same size
+
+    Returns:
+    np.ndarray: (frames, HEADER + frame_size + 4) uint8, one frame per row, CRCs computed together
+    '''
+    if not 0 < frame_size < 2**16:
+        raise ValueError("frame_size must fit the 16 bit length field.")
+    data = np.frombuffer(data, dtype=np.uint8) if isinstance(data, (bytes, bytearray)) \
+        else np.asarray(data, dtype=np.uint8).ravel()
+    count = max(-(-data.size // frame_size), 1)
+    frames = np.zeros((count, HEADER + frame_size + 4), dtype=np.uint8)
+
+    seq = np.arange(count) % 2**16
+    lengths = np.full(count, frame_size)
+    lengths[-1] = data.size - (count - 1) * frame_size
+    frames[:, 0], frames[:, 1] = seq >> 8, seq & 0xFF
+    frames[:, 2], frames[:, 3] = lengths >> 8, lengths & 0xFF
+    frames[-1, 4] = LAST
+    payload = np.zeros(count * frame_size, dtype=np.uint8)
+    payload[:data.size] = data
+    frames[:, HEADER:-4] = payload.reshape(count, frame_size)
+
+    crc = crc32(frames[:, :-4])
+    frames[:, -4:] = (crc[:, None] >> np.array([24, 16, 8, 0], dtype=np.uint32)).astype(np.uint8)
+    return frames
+
+
+def parse_frame(frame):
+    '''
+    Parameters:
+    frame (bytes | np.ndarray): one received frame
+
+    Returns:
+    (seq, payload, last), or None if the frame is too short or fails the CRC
+    '''
+    f = np.frombuffer(frame, dtype=np.uint8) if isinstance(frame, (bytes, bytearray)) else np.asarray(frame, dtype=np.uint8)
+    if f.size < HEADER + 4:
+        return None
+    if crc32(f[:-4]) != int.from_bytes(f[-4:].tobytes(), "big"):
+        return None
+    seq = (int(f[0]) << 8) | int(f[1])
+    length = (int(f[2]) << 8) | int(f[3])
+    if length > f.size - HEADER - 4:
+        return None
+    return seq, f[HEADER:HEADER + length].tobytes(), bool(f[4] & LAST)
+
+
+class ArqSender:
+    '''
+    Selective repeat sender. At most window frames are outstanding; a frame is sent again when
+    the receiver NACKs it or when it has gone unacknowledged for timeout seconds. Frames the
+    receiver already has are never resent.
+    '''
+
+    def __init__(self, data, frame_size=1000, window=32, timeout=0.5):
+        '''
+        Parameters:
+        data (bytes | np.ndarray): the message
+        frame_size (int): payload bytes per frame
+        window (int): frames in flight, at most 2**15 so 16 bit sequence numbers stay unambiguous
+        timeout (float): seconds without an ACK before a frame is resent
+        '''
+        if not 0 < window <= 2**15:
+            raise ValueError("window must be between 1 and 32768.")
+        self.frames = build_frames(data, frame_size)
+        self.window = window
+        self.timeout = timeout
+        n = len(self.frames)
+        self.acked = np.zeros(n, dtype=bool)
+        self.sent_at = np.full(n, -np.inf)
+        self.resend = np.zeros(n, dtype=bool)
+        self.base = 0           # first frame not acknowledged
+        self.next = 0           # first frame never sent
+        self.transmissions = 0
+        self.retransmissions = 0
+
+
+    @property
+    def done(self):
+        return self.base == len(self.frames)
+
+
+    def poll(self, now=None):
+        '''
+        Parameters:
+        now (float): current time, time.monotonic() by default
+
+        Returns:
+        list: the frames (bytes) to send now, retransmissions first
+        '''
+        now = time.monotonic() if now is None else now
+        out = []
+        flight = np.arange(self.base, self.next)
+        pending = ~self.acked[flight]
+        due = flight[pending & (self.resend[flight] | (now - self.sent_at[flight] >= self.timeout))]
+        self.resend[due] = False
+        self.sent_at[due] = now
+        self.retransmissions += due.size
+        out.extend(self.frames[i].tobytes() for i in due)
+
+        stop = min(self.base + self.window, len(self.frames))
+        new = np.arange(self.next, stop)
+        self.sent_at[new] = now
+        self.next = max(self.next, stop)
+        out.extend(self.frames[i].tobytes() for i in new)
+        self.transmissions += len(out)
+        return out
+
+
+    def _index(self, seq):
+        # sequence number back to a frame index, valid inside the window
+        return self.base + (seq - self.base) % 2**16
+
+
+    def on_feedback(self, feedback):
+        '''
+        Parameters:
+        feedback (dict): from ArqReceiver.feedback
+        '''
+        ack = self._index(feedback["ack"])
+        if ack <= self.next:
+            self.acked[self.base:ack] = True
+        for seq in feedback["sack"]:
+            i = self._index(seq)
+            if i < self.next:
+                self.acked[i] = True
+        for seq in feedback["nack"]:
+            i = self._index(seq)
+            if i < self.next and not self.acked[i]:
+                self.resend[i] = True
+        while self.base < len(self.frames) and self.acked[self.base]:
+            self.base += 1
+
+
+class ArqReceiver:
+    '''
+    Selective repeat receiver: frames that pass the CRC are buffered until the ones before them
+    arrive, then delivered in order. Gaps below the newest frame seen are NACKed.
+    '''
+
+    def __init__(self, window=32):
+        self.window = window
+        self.base = 0
+        self.buffer = {}
+        self.highest = -1
+        self.payloads = []
+        self.complete = False
+        self.crc_errors = 0
+        self.duplicates = 0
+
+
+    def receive(self, frame):
+        '''
+        Parameters:
+        frame (bytes | np.ndarray): one frame off the link
+        '''
+        parsed = parse_frame(frame)
+        if parsed is None:
+            self.crc_errors += 1
+            return
+        seq, payload, last = parsed
+        i = self.base + (seq - self.base) % 2**16
+        if i >= self.base + self.window or i in self.buffer:
+            # already delivered (the ACK got lost) or a copy of a buffered frame
+            self.duplicates += 1
+            return
+        self.buffer[i] = (payload, last)
+        self.highest = max(self.highest, i)
+        while self.base in self.buffer:
+            payload, last = self.buffer.pop(self.base)
+            self.payloads.append(payload)
+            self.base += 1
+            self.complete = self.complete or last
+
+
+    def feedback(self):
+        '''
+        Returns:
+        dict: ack, every frame before it was delivered; sack, frames buffered above it; nack,
+              frames missing below the newest one seen. All as 16 bit sequence numbers.
+        '''
+        above = range(self.base, self.highest + 1)
+        return {
+            "ack": self.base % 2**16,
+            "sack": [i % 2**16 for i in sorted(self.buffer)],
+            "nack": [i % 2**16 for i in above if i not in self.buffer],
+        }
+
+
+    def data(self):
+        return b"".join(self.payloads)
+
+
+class LossyLoopback:
+    '''
+    Stands in for the radio: drops frames, flips bits in others and can lose feedback.
+    '''
+
+    def __init__(self, loss=0.1, corrupt=0.05, feedback_loss=0.0, seed=None):
+        '''
+        Parameters:
+        loss (float): chance a frame is lost
+        corrupt (float): chance a surviving frame gets a bit error
+        feedback_loss (float): chance a feedback message is lost
+        seed (int): random seed
+        '''
+        self.loss = loss
+        self.corrupt = corrupt
+        self.feedback_loss = feedback_loss
+        self.rng = np.random.default_rng(seed)
+
+
+    def send(self, frames):
+        out = []
+        for frame in frames:
+            if self.rng.random() < self.loss:
+                continue
+            if self.rng.random() < self.corrupt:
+                f = bytearray(frame)
+                bit = int(self.rng.integers(len(f) * 8))
+                f[bit // 8] ^= 1 << (bit % 8)
+                frame = bytes(f)
+            out.append(frame)
+        return out
+
+
+    def send_feedback(self, feedback):
+        return None if self.rng.random() < self.feedback_loss else feedback
+
+
+def transfer(data, link, frame_size=1000, window=32, timeout=0.5, round_time=0.1, max_rounds=10000):
+    '''
+    Run a sender and a receiver against each other over link, one burst of frames and one
+    feedback message per round, on a simulated clock.
+
+    Parameters:
+    data (bytes): the message
+    link: has send(frames) -> frames and send_feedback(feedback) -> feedback or None, e.g. LossyLoopback
+    round_time (float): simulated seconds per round, compared against timeout
+
+    Returns:
+    received (bytes): the delivered message
+    stats (dict): rounds, frames, transmissions, retransmissions, crc_errors and airtime, the
+                  transmissions per frame of the message
+
+    Raises:
+    TimeoutError: the message was not fully delivered within max_rounds
+    '''
+    sender = ArqSender(data, frame_size, window, timeout)
+    receiver = ArqReceiver(window)
+    rounds = 0
+    while not sender.done and rounds < max_rounds:
+        for frame in link.send(sender.poll(rounds * round_time)):
+            receiver.receive(frame)
+        feedback = link.send_feedback(receiver.feedback())
+        if feedback is not None:
+            sender.on_feedback(feedback)
+        rounds += 1
+    if not sender.done:
+        raise TimeoutError(f"Only {receiver.base} of {len(sender.frames)} frames were delivered "
+                           f"in {max_rounds} rounds.")
+    stats = {
+        "rounds": rounds,
+        "frames": len(sender.frames),
+        "transmissions": sender.transmissions,
+        "retransmissions": sender.retransmissions,
+        "crc_errors": receiver.crc_errors,
+        "airtime": sender.transmissions / len(sender.frames),
+    }
+    return receiver.data(), stats
@@ -0,0 +1,194 @@
+'''
+throughput benchmark for every stage of the voice chain and for the whole chain
+
+run from voice_chat/:
+    python benchmark.py                       # 1 s, 10 s and 60 s of audio, results in bench_results.json
+    python benchmark.py --save-baseline       # also store the results as the baseline
+    python benchmark.py --durations 1 10      # compare against bench_baseline.json if it exists
+
+exits with status 1 if a stage got slower than the baseline by more than --tolerance
+'''
+import argparse
+import json
+import os
+import platform
+import time
+import tracemalloc
+import numpy as np
+from PAM import Pam
+from QAM import Qam
+from dpcm import dpcm_encode, dpcm_decode
+from fec import conv_encode, viterbi_decode
+from quantizer import quantize, audio_to_bits, bits_to_audio
+
+fs = 44100
+levels = 256
+N = 4
+sps = 3
+
+
+def speech_like(seconds, seed=0):
+    '''
+    Parameters:
+    seconds (float): length of the clip
+    seed (int): random seed
+
+    Returns:
+    audio (np.ndarray): float32 audio in [-1, 1] with a gliding pitch, harmonics,
+                        a syllable rate envelope and a little noise
+    '''
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * fs)) / fs
+    f0 = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / fs
+    voice = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 2
+    audio = 0.3 * envelope * voice + rng.normal(0, 0.01, t.size)
+    return np.clip(audio, -1, 1).astype(np.float32)
+
+
+def stages(audio):
+    '''
+    Build the inputs of every stage from the previous one, so each stage is timed on realistic data.
+
+    Returns:
+    list of (name, function, argument)
+    '''
+    P = Pam()
+    Q = Qam()
+    bits = audio_to_bits(audio, levels)
+    compressed = dpcm_encode(bits.data)
+    qam = Q.modulate(bits.data, 256, packed=True)
+    info = np.unpackbits(compressed)
+    coded = conv_encode(info)
+    symb = P.modulate(bits.data, N, packed=True)
+    message = P.create_message(symb, sps)
+    decoded = P.decode_message(message, sps, N)
+    index = P.detect_pam_index(N, decoded)
+    # the string based stages only ever see one second of audio
+    per_sample = 8 // P.bits_per_symbol(N)
+    detected = P.detect_pam_symbol(N, decoded[:fs * per_sample])
+    strings = [f"{v:08b}" for v in bits.data[:fs]]
+    return [
+        ("quantize", lambda x: quantize(x, levels), audio),
+        ("audio_to_bits", lambda x: audio_to_bits(x, levels), audio),
+        ("compression", dpcm_encode, bits.data),
+        ("decompression", lambda c: dpcm_decode(c, audio.size), compressed),
+        ("conv_encode", conv_encode, info),
+        ("viterbi_decode", viterbi_decode, coded),
+        ("modulate", lambda d: P.modulate(d, N, packed=True), bits.data),
+        ("digital_modulation2", lambda s: P.digital_modulation2(s, N), strings),
+        ("qam_modulate", lambda d: Q.modulate(d, 256, packed=True), bits.data),
+        ("qam_demodulate", lambda s: Q.demodulate(s, 256, packed=True), qam),
+        ("create_message", lambda s: P.create_message(s, sps), symb),
+        ("decode_message", lambda m: P.decode_message(m, sps, N), message),
+        ("detect_pam_index", lambda d: P.detect_pam_index(N, d), decoded),
+        ("symbols_to_bytes", lambda i: P.symbols_to_bytes(N, i), index),
+        ("symbol_to_bits2", lambda s: P.symbol_to_bits2(N, s), detected),
+        ("bits_to_audio", lambda b: bits_to_audio(b, levels), bits),
+        ("chain", chain, audio),
+    ]
+
+
+def chain(audio):
+    '''
+    the whole batch chain: quantize, compress, modulate, shape, decode, detect, demap,
+    decompress and reconstruct
+    '''
+    P = Pam()
+    bits = audio_to_bits(audio, levels)
+    compressed = dpcm_encode(bits.data)
+    message = P.create_message(P.modulate(compressed, N, packed=True), sps)
+    index = P.detect_pam_index(N, P.decode_message(message, sps, N))
+    received = dpcm_decode(P.symbols_to_bytes(N, index), audio.size)
+    return bits_to_audio(received, levels)
+
+
+def measure(fn, arg, repeat):
+    '''
+    Returns:
+    seconds (float): best time of repeat runs
+    peak (int): peak bytes allocated during one extra run
+    '''
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+
+    # measured separately, tracing slows everything down
+    tracemalloc.start()
+    fn(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def run(durations, repeat):
+    results = {}
+    for seconds in durations:
+        audio = speech_like(seconds)
+        for name, fn, arg in stages(audio):
+            n = min(audio.size, fs) if name in ("digital_modulation2", "symbol_to_bits2") else audio.size
+            t, peak = measure(fn, arg, repeat)
+            results[f"{name}@{seconds}s"] = {
+                "stage": name,
+                "audio_seconds": n / fs,
+                "seconds": t,
+                "samples_per_sec": n / t if t else float("inf"),
+                "real_time_factor": t / (n / fs),
+                "peak_bytes": peak,
+            }
+            print(f"{name:>20} {seconds:>4}s  {t * 1e3:9.2f} ms  {n / t / 1e6:8.2f} Msamples/s  "
+                  f"rtf {t / (n / fs):.5f}  peak {peak / 2**20:8.2f} MiB")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    '''
+    Returns:
+    regressions (list): names of the stages that are slower than baseline * (1 + tolerance)
+    '''
+    regressions = []
+    for key, r in results.items():
+        if key not in baseline:
+            continue
+        ratio = r["seconds"] / baseline[key]["seconds"]
+        if ratio > 1 + tolerance:
+            regressions.append(key)
+            print(f"REGRESSION {key}: {ratio:.2f}x the baseline time")
+    return regressions
+
+
+if __name__ == "__main__":
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="voice chain throughput benchmark")
+    parser.add_argument("--durations", type=float, nargs="+", default=[1, 10, 60])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default=os.path.join(here, "bench_results.json"))
+    parser.add_argument("--baseline", default=os.path.join(here, "bench_baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    durations = [int(d) if d == int(d) else d for d in args.durations]
+    results = run(durations, args.repeat)
+    report = {
+        "machine": platform.platform(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.out}")
+
+    regressions = []
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.baseline}")
+    raise SystemExit(1 if regressions else 0)
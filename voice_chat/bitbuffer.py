@@ -0,0 +1,110 @@
+# packed bit storage shared by quantization, compression, modulation and reconstruction
+import numpy as np
+
+
+class BitBuffer:
+    '''
+    A run of bits stored packed in a np.uint8 array (msb first), one bit per bit instead
+    of one python string per sample.
+
+    Attributes:
+    data (np.ndarray): the packed bytes, the last byte is zero padded
+    nbits (int): number of valid bits in data
+    '''
+
+    def __init__(self, data, nbits=None):
+        '''
+        Parameters:
+        data: packed bytes (np.uint8 array, bytes or bytearray). Arrays are kept without copying.
+        nbits (int): number of valid bits, defaults to 8 * len(data)
+        '''
+        if isinstance(data, (bytes, bytearray)):
+            data = np.frombuffer(data, dtype=np.uint8)
+        data = np.asarray(data)
+        if data.dtype != np.uint8 or data.ndim != 1:
+            raise ValueError("BitBuffer data must be a 1-D np.uint8 array.")
+        if nbits is None:
+            nbits = 8 * data.size
+        if not 0 <= 8 * data.size - nbits < 8:
+            raise ValueError(f"{nbits} bits do not fit in {data.size} bytes.")
+        self.data = data
+        self.nbits = nbits
+
+
+    @classmethod
+    def from_bits(cls, bits):
+        '''
+        Parameters:
+        bits: array of 0/1 values
+
+        Returns:
+        BitBuffer: the bits packed
+        '''
+        bits = np.asarray(bits, dtype=np.uint8).ravel()
+        return cls(np.packbits(bits), bits.size)
+
+
+    @classmethod
+    def from_samples(cls, samples, width=8):
+        '''
+        Parameters:
+        samples: unsigned integer samples, each stored in width bits (msb first)
+        width (int): bits per sample, 1 to 16
+
+        Returns:
+        BitBuffer: the samples back to back
+        '''
+        samples = np.asarray(samples).ravel()
+        if width == 8:
+            return cls(samples.astype(np.uint8, copy=False))
+        if not 1 <= width <= 16:
+            raise ValueError("Sample width must be between 1 and 16 bits.")
+        # write every sample as a big endian 16 bit word and keep the low width bits
+        words = samples.astype(">u2").view(np.uint8).reshape(-1, 2)
+        bits = np.unpackbits(words, axis=1)[:, 16 - width:]
+        return cls.from_bits(bits)
+
+
+    @property
+    def bits(self):
+        '''
+        Returns:
+        np.ndarray: the bits unpacked to one np.uint8 0/1 value per bit
+        '''
+        return np.unpackbits(self.data, count=self.nbits)
+
+
+    def samples(self, width=8):
+        '''
+        Parameters:
+        width (int): bits per sample, 1 to 16
+
+        Returns:
+        np.ndarray: the buffer read back as unsigned samples. For width 8 this is a view of data.
+        '''
+        if self.nbits % width:
+            raise ValueError(f"{self.nbits} bits cannot be split into {width}-bit samples.")
+        if width == 8:
+            return self.data[:self.nbits // 8]
+        if not 1 <= width <= 16:
+            raise ValueError("Sample width must be between 1 and 16 bits.")
+        weights = 1 << np.arange(width - 1, -1, -1, dtype=np.uint16)
+        return (self.bits.reshape(-1, width) @ weights).astype(np.uint16)
+
+
+    def tobytes(self):
+        return self.data.tobytes()
+
+
+    def __len__(self):
+        return self.nbits
+
+
+    def __eq__(self, other):
+        if not isinstance(other, BitBuffer):
+            return NotImplemented
+        return self.nbits == other.nbits and np.array_equal(self.bits, other.bits)
+
+
+    def __repr__(self):
+        return f"BitBuffer(nbits={self.nbits})"
@@ -0,0 +1,128 @@
+# carrier frequency offset estimation and phase tracking for the QAM receive path
+import numpy as np
+
+
+def estimate_cfo(symbols, order=4):
+    '''
+    Coarse carrier frequency offset from the FFT of the symbols raised to the order-th power,
+    which wipes out the modulation of square QAM (order 4), BPSK / PAM (order 2).
+
+    Parameters:
+    symbols (np.ndarray): one sample per symbol
+    order (int): symmetry order of the constellation
+
+    Returns:
+    cfo (float): offset in cycles per symbol, within +/- 0.5 / order
+    '''
+    x = np.asarray(symbols, dtype=np.complex128) ** order
+    if len(x) < 2:
+        return 0.0
+    nfft = 1 << int(4 * len(x) - 1).bit_length()
+    spectrum = np.abs(np.fft.fft(x, nfft))
+    k = int(np.argmax(spectrum))
+
+    # parabolic interpolation between the bins around the peak
+    a, b, c = spectrum[k - 1], spectrum[k], spectrum[(k + 1) % nfft]
+    denom = a - 2 * b + c
+    shift = 0.5 * (a - c) / denom if denom else 0.0
+    f = (k + shift) / nfft
+    if f >= 0.5:
+        f -= 1
+    return f / order
+
+
+def nearest(constellation):
+    '''
+    Parameters:
+    constellation (np.ndarray): constellation points
+
+    Returns:
+    slicer: function mapping received symbols to the nearest constellation points
+    '''
+    points = np.asarray(constellation, dtype=np.complex128)
+
+    def slicer(y):
+        return points[np.argmin(np.abs(y[:, None] - points[None, :]), axis=1)]
+
+    return slicer
+
+
+class CarrierRecovery:
+    '''
+    Coarse FFT frequency acquisition followed by a decision directed phase locked loop.
+
+    The loop runs at block rate: a block of symbols is derotated with the current phase and
+    frequency estimates, sliced, and the mean phase error of the block updates a proportional-
+    integral loop. Phase and frequency carry between calls, so a long capture can be fed in pieces.
+    Square QAM is symmetric under 90 degree rotations, so the loop locks with a multiple of 90 degrees
+    left over; the frame preamble resolves it.
+    '''
+
+    def __init__(self, constellation, slicer=None, block=32, kp=0.3, ki=0.02, order=4, coarse=True, window=1024):
+        '''
+        Parameters:
+        constellation (np.ndarray): constellation points
+        slicer: function returning the decisions for an array of symbols, nearest point by default
+        block (int): symbols per loop update
+        kp (float): proportional gain
+        ki (float): integral gain
+        order (int): symmetry order used by the coarse estimate
+        coarse (bool): estimate the frequency offset and phase from the first symbols before tracking
+        window (int): symbols used by the coarse estimate
+        '''
+        constellation = np.asarray(constellation, dtype=np.complex128)
+        self.slicer = nearest(constellation) if slicer is None else slicer
+        # the order-th power of the symbols averages to this angle when there is no phase offset
+        self.reference = float(np.angle(np.sum(constellation ** order)))
+        self.block = block
+        self.kp = kp
+        self.ki = ki
+        self.order = order
+        self.coarse = coarse
+        self.window = window
+        self.phase = 0.0        # radians, at the next symbol
+        self.freq = 0.0         # radians per symbol
+        self.acquired = False
+
+
+    def acquire(self, symbols):
+        '''
+        Set the frequency from the coarse estimate and the phase from the order-th power of the
+        derotated symbols, so the decision directed loop starts inside its pull-in range.
+        '''
+        symbols = np.asarray(symbols, dtype=np.complex128)[:self.window]
+        self.freq = 2 * np.pi * estimate_cfo(symbols, self.order)
+        k = np.arange(len(symbols))
+        x = np.sum((symbols * np.exp(-1j * self.freq * k)) ** self.order)
+        self.phase = (np.angle(x) - self.reference) / self.order
+        self.acquired = True
+
+
+    def process(self, symbols):
+        '''
+        Parameters:
+        symbols (np.ndarray): one sample per symbol, timing already recovered
+
+        Returns:
+        corrected (np.ndarray): the symbols derotated
+        errors (np.ndarray): mean phase error of every block in radians
+        '''
+        symbols = np.asarray(symbols, dtype=np.complex128)
+        if self.coarse and not self.acquired and len(symbols):
+            self.acquire(symbols)
+
+        corrected = np.empty_like(symbols)
+        errors = np.empty(-(-len(symbols) // self.block))
+        for b, start in enumerate(range(0, len(symbols), self.block)):
+            block = symbols[start:start + self.block]
+            k = np.arange(len(block))
+            y = block * np.exp(-1j * (self.phase + self.freq * k))
+            decisions = self.slicer(y)
+
+            # angle of the summed products weights strong symbols more, like the decision directed PLL
+            err = float(np.angle(np.sum(y * np.conj(decisions))))
+            self.freq += self.ki * err
+            self.phase = (self.phase + self.freq * len(block) + self.kp * err) % (2 * np.pi)
+            corrected[start:start + len(block)] = y
+            errors[b] = err
+        return corrected, errors
@@ -7,6 +7,10 @@ import threading
 import time
 import librosa
 from PAM import Pam
+from bitbuffer import BitBuffer
+from quantizer import quantize, audio_to_bits, bits_to_audio
+from ring_buffer import RingBuffer
+from dpcm import dpcm_decode, DpcmEncoder
 from comms_lib.pluto import Pluto
 from comms_lib.system import DigitalCommSystem
 
@@ -17,22 +21,17 @@ fs = 44100
 chunk = 1024                          
 bits = 8
 levels = 2**bits
+max_seconds = 60       # longest push-to-talk recording kept
 
 talk = threading.Event()
 recording_done = threading.Event()
 
 # Buffers
 live_buffer = np.zeros(chunk)
-recorded_audio = []
-
-# Quantization
-def quantize(signal, levels):
-    return np.round(signal * (levels // 2 - 1)) / (levels // 2 - 1)
-
-def audio_to_bits(buffer, levels):
-    quantized = quantize(buffer, levels)
-    int_levels = ((quantized + 1) / 2 * (levels - 1)).astype(int)
-    return [format(val, '08b') for val in int_levels]
+recorded_audio = RingBuffer(fs * max_seconds)
+samples = []            # 8 bit samples of every block, what the decoder has to give back
+compressed_blocks = []
+encoder = DpcmEncoder()
 
 # Plot setup
 fig, ax = plt.subplots()
@@ -68,12 +67,20 @@ def on_release(key):
 
 # Audio callback
 def audio_callback(indata, frames, time, status):
-    global live_buffer, recorded_audio
+    global live_buffer
     if status:
         print("Audio Status:", status)
     live_buffer[:] = indata[:, 0]
     if talk.is_set():
-        recorded_audio.append(indata.copy())
+        recorded_audio.write(indata)
+
+# Consumer side of the ring, runs on the main thread so the callback never allocates
+def compress_captured():
+    # compress what was captured since the last call, while the user is still talking
+    if recorded_audio.available:
+        block = audio_to_bits(recorded_audio.read()[:, 0], levels).samples()
+        samples.append(block)
+        compressed_blocks.append(encoder.encode(block))
 
 # Start listener
 print("Press and hold SPACE to record. Release to stop.")
@@ -87,24 +94,23 @@ stream.start()
 # Run non-blocking plot loop
 while not recording_done.is_set():
     plt.pause(0.01)  # allow GUI updates
+    compress_captured()
 
 # Cleanup
 plt.close(fig)
 stream.stop()
 stream.close()
 listener.join()
+compress_captured()
 
 
-# Combine and convert audio
-if recorded_audio:
-    audio_clip = np.concatenate(recorded_audio, axis=0).flatten()
-    bit_array = audio_to_bits(audio_clip, levels)
-
-    # Output
-    print(f"\nRecorded {len(audio_clip)/fs:.2f} seconds of audio")
-    print(f"Total bits captured: {len(bit_array)*bits}")
+# Output
+n_samples = sum(block.size for block in samples)
+if n_samples:
+    print(f"\nRecorded {n_samples/fs:.2f} seconds of audio")
+    print(f"Total bits captured: {8 * n_samples}")
     print("First 10 audio samples as bits:")
-    print(bit_array[:10])
+    print(BitBuffer(samples[0][:10]).bits)
 else:
     print("\nNo audio was recorded. Make sure you press and hold the spacebar while the plot window is open.")
 
@@ -113,104 +119,30 @@ else:
 # compression and decompression
 
 """
-Compress bit_array using differential encoding !
+Compress the captured samples using differential encoding !
 """
-                           
-def compression(b: np.array) -> str:
-    '''
-    compress the bits using differential encoding
-    Return:
-        encoded: a string of bits
-            first 8: starting value
-            after: 4 bit values --> [0]: +/-, [1:]: diff in binary 
-    '''
-    # bits = [b[i:i + 8] for i in range(0, b.size, 8)]
-    bits = b
-
-    encoded = bits[0]
-    prev = int(bits[0], 2)
-
-    for b in bits[1:]:              
-        diff = (int(b, 2) - prev)
-
-        if (abs(diff) > 8):
-            diff = max(-8, min(8, diff))
-
-        if (diff < 0):
-            encoded += ("0" + str(f'{(abs(diff)):03b}'))
-        else:
-            encoded += ("1" + str(f'{(diff):03b}'))
-
-        prev = (prev + diff) & 0xFF
-
-    return encoded
-
-
-def decompression(encoded):
-    '''
-    decompress numpy array back into original bit_array form
-    '''
-    # bit_str = "".join(encoded.astype(str))
-    bit_str = str(encoded)
-    nBits = 4
-    res = []
-
-    # get first value:
-    res.append(bit_str[:8])
-    prev = int(bit_str[:8], 2)
-
-    bit_str = bit_str[8:]
-
-    for i in range(0, len(bit_str), nBits):
-        sign = bit_str[i]
-        diff = bit_str[i+1:i+nBits]
-
-        if (diff == ""):
-            break
-
-        diff = int(diff, 2)
-
-        if sign == "0": # neg
-            res.append(f'{(prev - diff):08b}')
-            prev -= diff
-        else:
-            res.append(f'{(prev + diff):08b}')
-            prev += diff
-    return res
-
-
-
-compressed = compression(bit_array)
-print("Length of compressed data: " + str(len(compressed)))
-# print("compressed data: " + compressed[:100])
-
-
-# Corrept the symbols
-n = np.fromiter(compressed, dtype='U1')
-n = n.astype(int)
-corrupt = (
-    n
-    + np.random.normal(0, 0.1, n.shape)
-    + 1j * np.random.normal(0, 0.1, n.shape)
-)
-c = "".join(corrupt.astype(str))
 
+compressed_blocks.append(encoder.flush())
+compressed = np.concatenate(compressed_blocks)
+print("Length of compressed data: " + str(8 * compressed.size))
 
 
-decomp = decompression(c)
-print(decomp[:10])
-print("Data lost: " + str(not(decomp == bit_array)))
+# Corrept the bits
+n = np.unpackbits(compressed).astype(float)
+corrupt = n + np.random.normal(0, 0.1, n.shape)
+c = np.packbits(corrupt > 0.5)
 
 
 
-def bits_to_audio(bit_array, levels):
-    # Convert each 8-bit string back to int
-    int_levels = np.array([int(b, 2) for b in bit_array], dtype=np.int32)
+decomp = BitBuffer(dpcm_decode(c, encoder.n_samples))
+print(decomp.samples()[:10])
+# compare block by block against the samples that were compressed
+decoded = decomp.samples()
+offsets = np.cumsum([0] + [block.size for block in samples])
+lost = any(not np.array_equal(decoded[i:i + block.size], block) for i, block in zip(offsets, samples))
+print("Data lost: " + str(lost))
 
-    # Map from [0, 255] → [-1, 1] (inverse of quantization step)
-    audio = (int_levels / (levels - 1)) * 2 - 1
 
-    return audio.astype(np.float32)
 
 reconstructed_audio = bits_to_audio(decomp, 256) 
 
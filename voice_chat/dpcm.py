@@ -0,0 +1,366 @@
+# differential (DPCM) compression of 8 bit audio samples
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# largest step a 4 bit code (sign + 3 bit magnitude) can carry
+STEP = 7
+
+# IMA ADPCM step sizes (16 bit sample units) and step index changes per code magnitude
+IMA_STEPS = np.array([
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+    50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230, 253, 279, 307,
+    337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963, 1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066,
+    2272, 2499, 2749, 3024, 3327, 3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442, 11487, 12635, 13899,
+    15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794, 32767], dtype=np.int32)
+IMA_INDEX = np.array([-1, -1, -1, -1, 2, 4, 6, 8], dtype=np.int32)
+
+
+def _track(x):
+    '''
+    Run the clamped predictor over x.
+
+    While the predictor is locked onto the input (prev == previous sample) the next value is just
+    the input, so only the runs after a step larger than STEP need the sample by sample loop.
+
+    Parameters:
+    x (np.ndarray): int16 samples
+
+    Returns:
+    recon (np.ndarray): int16 predictor values, recon[0] == x[0]
+    '''
+    recon = x.copy()
+    over = np.flatnonzero(np.abs(np.diff(x)) > STEP) + 1
+    xs = None
+    done = 0
+    for k in over:
+        if k < done:
+            continue
+        if xs is None:
+            xs = x.tolist()
+        prev = xs[k - 1]
+        n = len(xs)
+        # slew towards the input until it is reached again
+        while k < n:
+            target = xs[k]
+            if target > prev + STEP:
+                prev += STEP
+            elif target < prev - STEP:
+                prev -= STEP
+            else:
+                prev = target
+            recon[k] = prev
+            if prev == target:
+                break
+            k += 1
+        done = k + 1
+    return recon
+
+
+def dpcm_encode(samples, mode="fixed"):
+    '''
+    compress the samples using differential encoding
+
+    Parameters:
+    samples (np.ndarray): 8 bit samples (0 - 255)
+    mode (str): "fixed" for the +/-7 step encoder described below, "ima" for adpcm_encode
+
+    Returns:
+    encoded (np.ndarray): packed np.uint8
+        first byte: starting value
+        after: one 4 bit code per sample, two per byte --> [0]: +/-, [1:]: diff in binary
+        an odd number of codes leaves the last low nibble zero
+    '''
+    if mode == "ima":
+        return adpcm_encode(samples)
+    if mode != "fixed":
+        raise ValueError(f"Unknown DPCM mode {mode!r}.")
+
+    x = np.asarray(samples).astype(np.int16).ravel()
+    if x.size == 0:
+        return np.zeros(0, dtype=np.uint8)
+
+    diff = np.diff(_track(x))
+    codes = (np.abs(diff) | ((diff >= 0) << 3)).astype(np.uint8)
+    if codes.size % 2:
+        codes = np.append(codes, np.uint8(0))
+
+    encoded = np.empty(1 + codes.size // 2, dtype=np.uint8)
+    encoded[0] = x[0]
+    encoded[1:] = (codes[0::2] << 4) | codes[1::2]
+    return encoded
+
+
+def dpcm_decode(encoded, n_samples, mode="fixed"):
+    '''
+    decompress the output of dpcm_encode
+
+    Parameters:
+    encoded (np.ndarray): packed np.uint8 from dpcm_encode
+    n_samples (int): number of samples that were encoded
+    mode (str): the mode given to dpcm_encode
+
+    Returns:
+    samples (np.ndarray): np.uint8 samples
+    '''
+    if mode == "ima":
+        return adpcm_decode(encoded, n_samples)
+    if mode != "fixed":
+        raise ValueError(f"Unknown DPCM mode {mode!r}.")
+
+    encoded = np.asarray(encoded, dtype=np.uint8)
+    if n_samples == 0:
+        return np.zeros(0, dtype=np.uint8)
+
+    codes = np.empty(2 * (encoded.size - 1), dtype=np.uint8)
+    codes[0::2] = encoded[1:] >> 4
+    codes[1::2] = encoded[1:] & 0x0F
+    codes = codes[:n_samples - 1]
+
+    diff = (codes & 0x07).astype(np.int16)
+    diff[codes < 8] *= -1
+
+    samples = np.empty(n_samples, dtype=np.int16)
+    samples[0] = encoded[0]
+    np.cumsum(diff, out=samples[1:])
+    samples[1:] += encoded[0]
+    return (samples & 0xFF).astype(np.uint8)
+
+
+def _ima_encode_loop(x, codes, pred, index, steps, adjust):
+    # sequential by nature: every step size depends on the previous code
+    for i in range(len(x)):
+        step = steps[index]
+        diff = x[i] - pred
+        code = 0
+        if diff < 0:
+            code = 8
+            diff = -diff
+        delta = step >> 3
+        if diff >= step:
+            code |= 4
+            diff -= step
+            delta += step
+        step >>= 1
+        if diff >= step:
+            code |= 2
+            diff -= step
+            delta += step
+        step >>= 1
+        if diff >= step:
+            code |= 1
+            delta += step
+
+        if code & 8:
+            pred = max(pred - delta, -32768)
+        else:
+            pred = min(pred + delta, 32767)
+        index = min(max(index + adjust[code & 7], 0), 88)
+        codes[i] = code
+    return pred, index
+
+
+def _ima_decode_loop(codes, out, pred, index, steps, adjust):
+    for i in range(len(codes)):
+        code = codes[i]
+        step = steps[index]
+        delta = step >> 3
+        if code & 4:
+            delta += step
+        if code & 2:
+            delta += step >> 1
+        if code & 1:
+            delta += step >> 2
+
+        if code & 8:
+            pred = max(pred - delta, -32768)
+        else:
+            pred = min(pred + delta, 32767)
+        index = min(max(index + adjust[code & 7], 0), 88)
+        out[i] = pred
+    return pred, index
+
+
+if njit is not None:
+    _ima_encode_loop = njit(cache=True)(_ima_encode_loop)
+    _ima_decode_loop = njit(cache=True)(_ima_decode_loop)
+
+
+def _run_loop(loop, values, pred, index):
+    '''
+    Run an IMA loop on values. Compiled loops get arrays, the plain python fallback gets
+    lists because indexing a list is much cheaper than indexing an ndarray element by element.
+    '''
+    if njit is not None:
+        out = np.empty(len(values), dtype=np.int32)
+        pred, index = loop(values.astype(np.int32), out, pred, index, IMA_STEPS, IMA_INDEX)
+        return out, pred, index
+    out = [0] * len(values)
+    pred, index = loop(values.tolist(), out, pred, index, IMA_STEPS.tolist(), IMA_INDEX.tolist())
+    return np.array(out, dtype=np.int32), pred, index
+
+
+def adpcm_encode(samples, index=0):
+    '''
+    compress the samples with IMA style adaptive differential encoding. The step size grows on
+    fast transients instead of clipping them like the fixed +/-7 encoder.
+
+    Parameters:
+    samples (np.ndarray): 8 bit samples (0 - 255)
+    index (int): starting step index (0 - 88)
+
+    Returns:
+    encoded (np.ndarray): packed np.uint8
+        first byte: starting value
+        second byte: starting step index
+        after: one 4 bit code per sample, two per byte --> [0]: +/-, [1:]: magnitude in steps
+    '''
+    x = np.asarray(samples).astype(np.int32).ravel()
+    if x.size == 0:
+        return np.zeros(0, dtype=np.uint8)
+
+    # work on 16 bit samples so the standard step table applies
+    x16 = (x - 128) << 8
+    codes, _, _ = _run_loop(_ima_encode_loop, x16[1:], int(x16[0]), index)
+    codes = codes.astype(np.uint8)
+    if codes.size % 2:
+        codes = np.append(codes, np.uint8(0))
+
+    encoded = np.empty(2 + codes.size // 2, dtype=np.uint8)
+    encoded[0] = x[0]
+    encoded[1] = index
+    encoded[2:] = (codes[0::2] << 4) | codes[1::2]
+    return encoded
+
+
+def adpcm_decode(encoded, n_samples):
+    '''
+    decompress the output of adpcm_encode
+
+    Parameters:
+    encoded (np.ndarray): packed np.uint8 from adpcm_encode
+    n_samples (int): number of samples that were encoded
+
+    Returns:
+    samples (np.ndarray): np.uint8 samples
+    '''
+    encoded = np.asarray(encoded, dtype=np.uint8)
+    if n_samples == 0:
+        return np.zeros(0, dtype=np.uint8)
+
+    codes = np.empty(2 * (encoded.size - 2), dtype=np.uint8)
+    codes[0::2] = encoded[2:] >> 4
+    codes[1::2] = encoded[2:] & 0x0F
+    codes = codes[:n_samples - 1]
+
+    pred16, _, _ = _run_loop(_ima_decode_loop, codes, (int(encoded[0]) - 128) << 8, int(encoded[1]))
+
+    samples = np.empty(n_samples, dtype=np.int32)
+    samples[0] = encoded[0]
+    samples[1:] = ((pred16 + 128) >> 8) + 128
+    return np.clip(samples, 0, 255).astype(np.uint8)
+
+
+class DpcmEncoder:
+    '''
+    Streaming version of dpcm_encode. Blocks can be fed as they are captured and the predictor
+    carries across block boundaries, so the concatenated output equals dpcm_encode of the whole clip.
+    '''
+
+    def __init__(self):
+        self.prev = None
+        self.pending = None     # a code waiting for its partner nibble
+        self.n_samples = 0
+
+
+    def encode(self, block):
+        '''
+        Parameters:
+        block (np.ndarray): the next 8 bit samples
+
+        Returns:
+        encoded (np.ndarray): the packed np.uint8 bytes that are complete so far
+        '''
+        x = np.asarray(block).astype(np.int16).ravel()
+        if x.size == 0:
+            return np.zeros(0, dtype=np.uint8)
+
+        head = []
+        if self.prev is None:
+            head.append(x[0])
+            self.prev = int(x[0])
+            x = x[1:]
+        self.n_samples += len(head) + x.size
+
+        # the predictor value is the locked starting point of this block
+        recon = _track(np.concatenate(([self.prev], x)).astype(np.int16))
+        self.prev = int(recon[-1])
+        diff = np.diff(recon)
+        codes = (np.abs(diff) | ((diff >= 0) << 3)).astype(np.uint8)
+
+        if self.pending is not None:
+            codes = np.concatenate(([self.pending], codes)).astype(np.uint8)
+            self.pending = None
+        if codes.size % 2:
+            self.pending = codes[-1]
+            codes = codes[:-1]
+
+        body = (codes[0::2] << 4) | codes[1::2]
+        return np.concatenate((np.array(head, dtype=np.uint8), body)).astype(np.uint8)
+
+
+    def flush(self):
+        '''
+        Returns:
+        encoded (np.ndarray): the last half filled byte, if any
+        '''
+        if self.pending is None:
+            return np.zeros(0, dtype=np.uint8)
+        last = np.array([self.pending << 4], dtype=np.uint8)
+        self.pending = None
+        return last
+
+
+class DpcmDecoder:
+    '''
+    Streaming version of dpcm_decode, fed with the bytes of a DpcmEncoder in any split.
+    '''
+
+    def __init__(self):
+        self.prev = None
+
+
+    def decode(self, encoded, n_samples=None):
+        '''
+        Parameters:
+        encoded (np.ndarray): the next packed np.uint8 bytes
+        n_samples (int): number of samples to take out of these bytes, used on the last
+                         call to drop the padding nibble. Defaults to all of them.
+
+        Returns:
+        samples (np.ndarray): np.uint8 samples
+        '''
+        encoded = np.asarray(encoded, dtype=np.uint8).ravel()
+        if self.prev is None and encoded.size == 0:
+            return np.zeros(0, dtype=np.uint8)
+        head = []
+        if self.prev is None:
+            self.prev = int(encoded[0])
+            head.append(self.prev)
+            encoded = encoded[1:]
+
+        codes = np.empty(2 * encoded.size, dtype=np.uint8)
+        codes[0::2] = encoded >> 4
+        codes[1::2] = encoded & 0x0F
+        if n_samples is not None:
+            codes = codes[:max(n_samples - len(head), 0)]
+
+        diff = (codes & 0x07).astype(np.int16)
+        diff[codes < 8] *= -1
+        values = (np.cumsum(diff) + self.prev) & 0xFF
+        if values.size:
+            self.prev = int(values[-1])
+        return np.concatenate((np.array(head, dtype=np.uint8), values.astype(np.uint8)))
@@ -0,0 +1,148 @@
+# forward error correction: rate 1/2, K = 7 convolutional code (171, 133 octal) with a Viterbi decoder
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+K = 7
+GENERATORS = (0o171, 0o133)
+STATES = 2 ** (K - 1)
+
+# the state is the last K - 1 input bits, newest in the top bit: on input b, state s goes to
+# (b << 5) | (s >> 1). Next state ns = b * 32 + j is reached from the states 2j and 2j + 1.
+_TAPS = np.array([[(g >> (K - 1 - i)) & 1 for i in range(K)] for g in GENERATORS], dtype=np.int64)
+
+
+def _branch_signs():
+    '''
+    Returns:
+    np.ndarray: (2 predecessors, 2 outputs, 64 next states) of +1 / -1, the expected BPSK values
+                of the two coded bits on every branch
+    '''
+    ns = np.arange(STATES)
+    signs = np.empty((2, 2, STATES))
+    for low in range(2):
+        prev = 2 * (ns & (STATES // 2 - 1)) + low
+        register = ((ns >> (K - 2)) << (K - 1)) | prev
+        for o, g in enumerate(GENERATORS):
+            parity = np.array([bin(r & g).count("1") & 1 for r in register])
+            signs[low, o] = 1 - 2 * parity
+    return signs
+
+
+_SIGNS = _branch_signs()
+
+
+def conv_encode(bits, terminate=True):
+    '''
+    Parameters:
+    bits (np.ndarray): 0/1 information bits
+    terminate (bool): append K - 1 zeros so the encoder ends in state 0
+
+    Returns:
+    np.ndarray: uint8 coded bits, the two generator outputs interleaved, 2 * (len(bits) + 6) long
+                when terminated
+    '''
+    u = np.asarray(bits, dtype=np.int64).ravel()
+    if terminate:
+        u = np.concatenate((u, np.zeros(K - 1, dtype=np.int64)))
+    if u.size == 0:
+        return np.zeros(0, dtype=np.uint8)
+    coded = np.empty((u.size, 2), dtype=np.uint8)
+    for o in range(2):
+        coded[:, o] = np.convolve(u, _TAPS[o])[:u.size] & 1
+    return coded.ravel()
+
+
+def _windows(x, count, step, length):
+    # overlapping (count, length, 2) views of x, one every step rows
+    return as_strided(x, shape=(count, length, 2),
+                      strides=(step * x.strides[0], x.strides[0], x.strides[1]), writeable=False)
+
+
+def _decode_windows(soft):
+    '''
+    Run the add-compare-select recursion for a batch of windows at once and trace back.
+
+    Parameters:
+    soft (np.ndarray): (W, T, 2) soft values of every window
+
+    Returns:
+    np.ndarray: (W, T) decoded bits of every window
+    '''
+    W, T, _ = soft.shape
+    metric = np.zeros((W, STATES), dtype=np.float32)
+    decisions = np.empty((T, W, STATES), dtype=bool)
+    # (2, 128): columns are the branch signs from the even then the odd predecessors
+    signs = _SIGNS.transpose(1, 0, 2).reshape(2, 2 * STATES).astype(np.float32)
+
+    for t in range(T):
+        branch = (soft[:, t] @ signs).reshape(W, 2, 2, STATES // 2)
+        pairs = metric.reshape(W, STATES // 2, 2)
+        from_even = pairs[:, None, :, 0] + branch[:, 0]
+        from_odd = pairs[:, None, :, 1] + branch[:, 1]
+        np.greater(from_odd, from_even, out=decisions[t].reshape(W, 2, STATES // 2))
+        metric = np.maximum(from_even, from_odd).reshape(W, STATES)
+        if t % 32 == 31:
+            # keep the float32 metrics small
+            metric -= metric.max(axis=1, keepdims=True)
+
+    rows = np.arange(W)
+    state = np.argmax(metric, axis=1)
+    bits = np.empty((W, T), dtype=np.uint8)
+    for t in range(T - 1, -1, -1):
+        bits[:, t] = state >> (K - 2)
+        state = 2 * (state & (STATES // 2 - 1)) + decisions[t, rows, state]
+    return bits
+
+
+def viterbi_decode(received, terminated=True, window=512, depth=35, batch=512):
+    '''
+    Maximum likelihood decoding of conv_encode output.
+
+    The stream is cut into windows of window bits that are decoded independently and in parallel:
+    each window also runs depth steps before it (warm-up, so the metrics have converged when the
+    window starts) and depth steps after it (so the traceback has merged into the survivor path
+    before it reaches the window). The add-compare-select step handles all 64 states of up to batch
+    windows in one array operation.
+
+    Parameters:
+    received (np.ndarray): coded bits, either hard decisions (0/1 integers or bools) or soft
+                           values as floats, e.g. LLRs, positive for a 0 bit
+    terminated (bool): the encoder was terminated, the decoder then knows it ends in state 0
+    window (int): bits decided per window
+    depth (int): warm-up and traceback length, about 5 * K
+    batch (int): windows decoded at once, bounds the decision memory to
+                 batch * (window + 2 * depth) * 64 bytes
+
+    Returns:
+    np.ndarray: uint8 decoded bits, without the termination bits
+    '''
+    received = np.asarray(received).ravel()
+    if received.size % 2:
+        raise ValueError("The coded stream must have an even number of bits.")
+    if received.dtype.kind in "biu":
+        soft = 1 - 2 * received.astype(np.float32)
+    else:
+        soft = received.astype(np.float32)
+    n = soft.size // 2
+    if n == 0:
+        return np.zeros(0, dtype=np.uint8)
+
+    # the encoder starts in state 0, as if it had been fed zeros forever, so leading with the
+    # coded zeros (strong +1) lets the first window warm up like any other. A terminated stream
+    # stays in state 0 after its end too, an open one is followed by erasures.
+    strong = max(float(np.abs(soft).max()), 1.0)
+    count = -(-n // window)
+    tail = count * window - n + depth
+    pad = np.full((depth, 2), strong, dtype=np.float32)
+    end = np.full((tail, 2), strong if terminated else 0, dtype=np.float32)
+    padded = np.ascontiguousarray(np.concatenate((pad, soft.reshape(n, 2), end)))
+
+    out = np.empty((count, window), dtype=np.uint8)
+    length = window + 2 * depth
+    for first in range(0, count, batch):
+        last = min(first + batch, count)
+        views = _windows(padded[first * window:], last - first, window, length)
+        out[first:last] = _decode_windows(views)[:, depth:depth + window]
+
+    bits = out.ravel()[:n]
+    return bits[:n - (K - 1)] if terminated else bits
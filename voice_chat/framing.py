@@ -0,0 +1,202 @@
+# burst framing: preamble + header + payload, and frame synchronization on the receive side
+import numpy as np
+from PAM import Pam
+
+
+def zadoff_chu(length=63, root=25):
+    '''
+    Parameters:
+    length (int): odd sequence length
+    root (int): root index, coprime with length
+
+    Returns:
+    np.ndarray: constant amplitude sequence whose cyclic autocorrelation is zero at every nonzero lag
+    '''
+    n = np.arange(length)
+    return np.exp(-1j * np.pi * root * n * (n + 1) / length)
+
+
+BARKER_13 = np.array([1, 1, 1, 1, 1, -1, -1, 1, 1, -1, 1, -1, 1], dtype=np.complex128)
+
+
+class Frame:
+    '''
+    One frame pulled out of a receive buffer.
+
+    Attributes:
+    seq (int): sequence number from the header
+    symbols (np.ndarray): payload symbols, gain and phase corrected
+    start (int): sample index of the preamble in the receive buffer
+    gain (complex): channel gain estimated from the preamble
+    mode (int): modulation and coding mode from the header, an index into link_adapt.MODES
+    snr (float): symbol SNR in dB measured on the preamble
+    '''
+
+    def __init__(self, seq, symbols, start, gain, mode=0, snr=None):
+        self.seq = seq
+        self.symbols = symbols
+        self.start = start
+        self.gain = gain
+        self.mode = mode
+        self.snr = snr
+
+
+    def __repr__(self):
+        return f"Frame(seq={self.seq}, mode={self.mode}, symbols={len(self.symbols)}, start={self.start})"
+
+
+class Framer:
+    '''
+    Frame format, one entry per symbol:
+        preamble (Zadoff-Chu by default) | header: seq (16 bits) + payload length (16 bits)
+        + mode (8 bits) as BPSK | payload
+
+    The receiver finds every preamble in a capture with one FFT cross-correlation, so frames can
+    be sent back to back and all of them are recovered from a single large receive buffer.
+    '''
+
+    HEADER_FIELDS = (("seq", 16), ("length", 16), ("mode", 8))
+
+    def __init__(self, sps, preamble=None, threshold=0.5):
+        '''
+        Parameters:
+        sps (int): samples per symbol
+        preamble (np.ndarray): preamble symbols, a length 63 Zadoff-Chu sequence by default
+        threshold (float): normalized correlation (0 - 1) needed to accept a preamble
+        '''
+        self.sps = sps
+        self.preamble = zadoff_chu() if preamble is None else np.asarray(preamble, dtype=np.complex128)
+        self.threshold = threshold
+        self.P = Pam()
+        self.header_bits = sum(width for _, width in self.HEADER_FIELDS)
+        self.reference = self.P.create_message(self.preamble, sps)
+        self.ref_energy = np.sum(np.abs(self.reference) ** 2)
+
+
+    def header_symbols(self, **fields):
+        bits = []
+        for name, width in self.HEADER_FIELDS:
+            value = fields[name]
+            if not 0 <= value < 2**width:
+                raise ValueError(f"Header field {name} = {value} does not fit in {width} bits.")
+            bits.append((value >> np.arange(width - 1, -1, -1)) & 1)
+        return 2.0 * np.concatenate(bits) - 1
+
+
+    def parse_header(self, symbols):
+        bits = (np.real(symbols) > 0).astype(np.int64)
+        fields = {}
+        i = 0
+        for name, width in self.HEADER_FIELDS:
+            fields[name] = int(bits[i:i + width] @ (1 << np.arange(width - 1, -1, -1)))
+            i += width
+        return fields
+
+
+    def build(self, payload, seq, mode=0):
+        '''
+        Parameters:
+        payload (np.ndarray): payload symbols
+        seq (int): sequence number, 0 - 65535
+        mode (int): modulation and coding mode of the payload, see link_adapt.MODES
+
+        Returns:
+        np.ndarray: the frame's transmit samples
+        '''
+        payload = np.asarray(payload)
+        symbols = np.concatenate((self.preamble, self.header_symbols(seq=seq, length=len(payload), mode=mode), payload))
+        return self.P.create_message(symbols, self.sps)
+
+
+    def build_burst(self, payloads, first_seq=0, gap=0, mode=0):
+        '''
+        Parameters:
+        payloads (list): payload symbols of every frame
+        first_seq (int): sequence number of the first frame
+        gap (int): zero samples between frames
+        mode (int): mode of every frame
+
+        Returns:
+        np.ndarray: all frames back to back
+        '''
+        parts = []
+        for i, payload in enumerate(payloads):
+            parts.append(self.build(payload, (first_seq + i) % 2**16, mode))
+            parts.append(np.zeros(gap))
+        return np.concatenate(parts)
+
+
+    def correlate(self, rx):
+        '''
+        Cross-correlate rx with the preamble waveform through the FFT, O(n log n).
+
+        Returns:
+        corr (np.ndarray): corr[k] = sum(rx[k + i] * conj(reference[i]))
+        metric (np.ndarray): |corr|^2 normalized by the energy of both windows, 1 for a perfect match
+        '''
+        rx = np.asarray(rx)
+        L = len(self.reference)
+        n = len(rx) - L + 1
+        if n <= 0:
+            return np.zeros(0, dtype=np.complex128), np.zeros(0)
+        nfft = 1 << int(len(rx) + L - 1).bit_length()
+        corr = np.fft.ifft(np.fft.fft(rx, nfft) * np.conj(np.fft.fft(self.reference, nfft)))[:n]
+
+        power = np.concatenate(([0.0], np.cumsum(np.abs(rx) ** 2)))
+        window = power[L:L + n] - power[:n]
+        metric = np.abs(corr) ** 2 / (self.ref_energy * np.maximum(window, 1e-12))
+        return corr, metric
+
+
+    def find_peaks(self, metric):
+        '''
+        Returns:
+        peaks (np.ndarray): the best index of every run of metric above threshold
+        '''
+        above = np.flatnonzero(metric > self.threshold)
+        if above.size == 0:
+            return above
+        # runs closer than one preamble belong to the same frame
+        breaks = np.flatnonzero(np.diff(above) > len(self.reference)) + 1
+        runs = np.split(above, breaks)
+        return np.array([run[np.argmax(metric[run])] for run in runs])
+
+
+    def find(self, rx):
+        '''
+        Pull every complete frame out of a receive buffer.
+
+        Parameters:
+        rx (np.ndarray): received samples
+
+        Returns:
+        frames (list): Frame objects in the order they appear in rx
+        '''
+        rx = np.asarray(rx)
+        corr, metric = self.correlate(rx)
+        sps = self.sps
+        n_pre = len(self.preamble)
+        frames = []
+        for peak in self.find_peaks(metric):
+            gain = corr[peak] / self.ref_energy
+            start = peak + n_pre * sps
+            if start > len(rx):
+                continue
+
+            # error vector of the preamble symbols once the channel gain is taken out
+            preamble = self.P.decode_message(rx[peak:start], sps, 2) / gain
+            evm = np.mean(np.abs(preamble - self.preamble) ** 2) / np.mean(np.abs(self.preamble) ** 2)
+            snr = float(-10 * np.log10(max(evm, 1e-12)))
+
+            end = start + self.header_bits * sps
+            if end > len(rx):
+                continue
+            header = self.P.decode_message(rx[start:end], sps, 2) / gain
+            fields = self.parse_header(header)
+
+            end_payload = end + fields["length"] * sps
+            if end_payload > len(rx):
+                continue
+            payload = self.P.decode_message(rx[end:end_payload], sps, 2) / gain
+            frames.append(Frame(fields["seq"], payload, int(peak), gain, fields["mode"], snr))
+        return frames
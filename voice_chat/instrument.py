@@ -0,0 +1,197 @@
+# per stage latency histograms for a live session
+import json
+import math
+import threading
+import time
+import numpy as np
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("inst", "stage", "start")
+
+    def __init__(self, inst, stage):
+        self.inst = inst
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.inst.record(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class Instrumentation:
+    '''
+    Times the stages of the chain into fixed log spaced histograms (1 µs to 100 s, 10 bins per
+    decade) and appends a summary line to a JSON lines file every flush_interval seconds.
+
+    Recording is a clock read, a log10 and one counter increment. A disabled instance returns a
+    shared no-op span and skips everything else, so it can stay in the hot path. One instance can
+    be shared by the threads of a pipeline: updates and snapshots are taken under a lock, and
+    summaries and flushes work on the snapshot after releasing it.
+
+    usage:
+        inst = Instrumentation("session.jsonl")
+        with inst.span("modulation"):
+            ...
+        t = inst.start(); ...; inst.stop("sdr_tx", t)      # same thing without the span object
+        inst.count("underrun")
+    '''
+
+    LOW = -6            # 10**LOW seconds is the first bin edge
+    DECADES = 8
+    PER_DECADE = 10
+    EDGES = 10.0 ** (LOW + np.arange(DECADES * PER_DECADE + 1) / PER_DECADE)
+
+    def __init__(self, path=None, enabled=True, flush_interval=1.0):
+        '''
+        Parameters:
+        path (str): JSON lines file the summaries are appended to, None keeps them in memory only
+        enabled (bool): False turns every call into a no-op
+        flush_interval (float): seconds between automatic flushes
+        '''
+        self.path = path
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.hist = {}
+        self.totals = {}
+        self.counters = {}
+        self.last_flush = time.perf_counter()
+        self.lock = threading.RLock()
+        self.file_lock = threading.Lock()   # keeps flushed lines whole without blocking record
+
+
+    def _histogram(self, stage):
+        # called with the lock held
+        h = self.hist.get(stage)
+        if h is None:
+            # bin 0 catches everything below the first edge, the last bin everything above
+            h = self.hist[stage] = np.zeros(len(self.EDGES) + 1, dtype=np.int64)
+            self.totals[stage] = 0.0
+        return h
+
+
+    def span(self, stage):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage)
+
+
+    def start(self):
+        return time.perf_counter() if self.enabled else 0.0
+
+
+    def stop(self, stage, start):
+        if self.enabled:
+            self.record(stage, time.perf_counter() - start)
+
+
+    def record(self, stage, seconds):
+        '''
+        Parameters:
+        stage (str): stage name
+        seconds (float): how long the stage took
+        '''
+        if not self.enabled:
+            return
+        if seconds > 0:
+            b = int((math.log10(seconds) - self.LOW) * self.PER_DECADE) + 1
+            b = min(max(b, 0), len(self.EDGES))
+        else:
+            b = 0
+        now = time.perf_counter()
+        with self.lock:
+            h = self.hist.get(stage)
+            if h is None:
+                h = self._histogram(stage)
+            h[b] += 1
+            self.totals[stage] += seconds
+            due = now - self.last_flush >= self.flush_interval
+            if due:
+                # only one thread flushes per interval
+                self.last_flush = now
+        if due:
+            self.flush(now)
+
+
+    def count(self, name, n=1):
+        '''
+        count an event such as an underrun or a dropped block
+        '''
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+
+
+    def percentile(self, stage, q):
+        '''
+        Parameters:
+        stage (str): stage name
+        q (float): percentile, 0 - 100
+
+        Returns:
+        seconds (float): geometric centre of the bin holding the percentile, None if nothing was recorded
+        '''
+        with self.lock:
+            h = self.hist.get(stage)
+            h = None if h is None else h.copy()
+        return self._percentile(h, q)
+
+
+    def _percentile(self, h, q):
+        # percentile of a histogram the caller already copied
+        if h is None or not h.sum():
+            return None
+        b = int(np.searchsorted(np.cumsum(h), q / 100 * h.sum()))
+        b = min(max(b, 1), len(self.EDGES) - 1)
+        return float(np.sqrt(self.EDGES[b - 1] * self.EDGES[b]))
+
+
+    def summary(self):
+        '''
+        Returns:
+        dict: count, mean, p50 and p99 of every stage, plus the event counters
+        '''
+        with self.lock:
+            snapshot = [(stage, h.copy(), self.totals[stage]) for stage, h in self.hist.items()]
+            counters = dict(self.counters)
+        stages = {}
+        for stage, h, total in snapshot:
+            n = int(h.sum())
+            stages[stage] = {
+                "count": n,
+                "mean": total / n if n else None,
+                "p50": self._percentile(h, 50),
+                "p99": self._percentile(h, 99),
+            }
+        return {"stages": stages, "counters": counters}
+
+
+    def flush(self, now=None):
+        '''
+        Append the current summary to path.
+        '''
+        self.last_flush = time.perf_counter() if now is None else now
+        if not self.enabled or self.path is None:
+            return
+        # summary copies under the lock, the file is written after it is released
+        line = json.dumps({"time": time.time(), **self.summary()}) + "\n"
+        with self.file_lock, open(self.path, "a") as f:
+            f.write(line)
+
+
+# shared disabled instance, the default wherever instrumentation is optional
+NULL = Instrumentation(enabled=False)
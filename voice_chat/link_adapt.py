@@ -0,0 +1,103 @@
+# link adaptation: choose the modulation and code rate of the next frames from the measured SNR
+import numpy as np
+
+
+class Mode:
+    '''
+    One modulation and coding scheme.
+
+    Attributes:
+    M (int): QAM order
+    rate (float): convolutional code rate (fec.py), 1 for uncoded
+    snr_db (float): symbol SNR (Es/N0) needed for a bit error rate of 1e-5
+    '''
+
+    def __init__(self, M, rate, snr_db):
+        self.M = M
+        self.rate = rate
+        self.snr_db = snr_db
+
+
+    @property
+    def bits_per_symbol(self):
+        return np.log2(self.M) * self.rate
+
+
+    def __repr__(self):
+        return f"Mode({self.M}-QAM, rate {self.rate:g}, {self.snr_db} dB)"
+
+
+# indexed by the mode field of the frame header. Thresholds measured on an AWGN channel with Gray
+# mapping, max-log LLRs and the soft Viterbi decoder, 0.5 dB steps.
+MODES = (
+    Mode(4, 1 / 2, 5.0),
+    Mode(4, 1, 13.0),
+    Mode(16, 1 / 2, 10.0),
+    Mode(16, 1, 19.5),
+    Mode(64, 1 / 2, 14.0),
+    Mode(64, 1, 26.0),
+    Mode(256, 1 / 2, 18.5),
+    Mode(256, 1, 32.0),
+)
+
+
+class LinkAdapter:
+    '''
+    Chooses the mode with the most information bits per symbol whose threshold the smoothed SNR
+    clears by margin. It steps down as soon as the current mode's threshold is no longer cleared,
+    but only steps up once the SNR is hysteresis dB above the better mode's threshold, so an SNR
+    hovering around a threshold does not flip the mode every frame.
+    '''
+
+    def __init__(self, modes=MODES, margin=1.0, hysteresis=1.0, alpha=0.3, start=0):
+        '''
+        Parameters:
+        modes (tuple): Mode table, the header carries the index into it
+        margin (float): dB kept above every threshold
+        hysteresis (float): extra dB needed before moving to a faster mode
+        alpha (float): weight of the newest SNR estimate in the running average, 1 disables smoothing
+        start (int): mode used until the first estimate arrives
+        '''
+        self.modes = modes
+        self.margin = margin
+        self.hysteresis = hysteresis
+        self.alpha = alpha
+        self.mode = start
+        self.snr_db = None
+        # fastest first, the more robust mode first when two carry the same bits
+        self.order = sorted(range(len(modes)), key=lambda i: (-modes[i].bits_per_symbol, modes[i].snr_db))
+
+
+    def best(self, snr_db):
+        '''
+        Returns:
+        int: index of the fastest mode whose threshold snr_db clears by margin, the most robust
+             mode if none does
+        '''
+        for i in self.order:
+            if self.modes[i].snr_db + self.margin <= snr_db:
+                return i
+        return min(range(len(self.modes)), key=lambda i: self.modes[i].snr_db)
+
+
+    def update(self, snr_db):
+        '''
+        Parameters:
+        snr_db (float): SNR estimate of the last received frame, e.g. Frame.snr
+
+        Returns:
+        int: mode index for the next frames
+        '''
+        if self.snr_db is None:
+            self.snr_db = snr_db
+        else:
+            self.snr_db += self.alpha * (snr_db - self.snr_db)
+
+        target = self.best(self.snr_db)
+        current = self.modes[self.mode]
+        if self.modes[target].bits_per_symbol > current.bits_per_symbol:
+            if self.snr_db >= self.modes[target].snr_db + self.margin + self.hysteresis:
+                self.mode = target
+        elif self.snr_db < current.snr_db + self.margin:
+            self.mode = target
+        return self.mode
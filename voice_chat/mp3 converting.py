@@ -7,11 +7,14 @@ import threading
 import time
 import librosa
 from PAM import Pam
+from QAM import Qam
+from bitbuffer import BitBuffer
+from quantizer import quantize, bits_to_audio
+from ring_buffer import RingBuffer
+from txrx import TxRxEngine
 from comms_lib.pluto import Pluto
 from comms_lib.system import DigitalCommSystem
 
-from comms_lib.dsp import *
-
 import soundfile as sf
 import lameenc
 
@@ -20,22 +23,15 @@ fs = 44100
 chunk = 1024                          
 bits = 8
 levels = 2**bits
+max_seconds = 60       # longest push-to-talk recording kept
 
 talk = threading.Event()
 recording_done = threading.Event()
 
 # Buffers
 live_buffer = np.zeros(chunk)
-recorded_audio = []
-
-# Quantization
-def quantize(signal, levels):
-    return np.round(signal * (levels // 2 - 1)) / (levels // 2 - 1)
+recorded_audio = RingBuffer(fs * max_seconds)
 
-def audio_to_bits(buffer, levels):
-    quantized = quantize(buffer, levels)
-    int_levels = ((quantized + 1) / 2 * (levels - 1)).astype(int)
-    return [format(val, '08b') for val in int_levels]   
 
 fig, ax = plt.subplots()
 x = np.arange(chunk)
@@ -70,12 +66,12 @@ def on_release(key):
 
 # Audio callback
 def audio_callback(indata, frames, time, status):
-    global live_buffer, recorded_audio
+    global live_buffer
     if status:
         print("Audio Status:", status)
     live_buffer[:] = indata[:, 0]
     if talk.is_set():
-        recorded_audio.append(indata.copy())
+        recorded_audio.write(indata)
 
 # Start listener
 print("Press and hold SPACE to record. Release to stop.")
@@ -98,8 +94,8 @@ listener.join()
 
 
 # Combine and convert audio
-if recorded_audio:
-    audio_clip = np.concatenate(recorded_audio, axis=0).flatten()
+if recorded_audio.available:
+    audio_clip = recorded_audio.read().flatten()
     # bit_array = audio_to_bits(audio_clip, levels)
     # bit_strs = audio_to_bits(audio_clip, levels)
     # bit_array = np.array([int(b) for bits in bit_strs for b in bits], dtype=int)
@@ -124,10 +120,10 @@ mp3_data = encoder.encode(audio_clip)
 mp3_data += encoder.flush()
 
 # Convert MP3 bytes → array of bits
-byte_arr   = np.frombuffer(mp3_data, dtype=np.uint8)
-bit_array  = np.unpackbits(byte_arr, bitorder='big')
+mp3_buf   = BitBuffer(mp3_data)
+bit_array = mp3_buf.bits
 
-print(f"Total bits: {bit_array.size}  (i.e. {bit_array.size/8:.1f} bytes)")
+print(f"Total bits: {len(mp3_buf)}  (i.e. {mp3_buf.data.size} bytes)")
 print("First 32 bits:", bit_array[:32])
 
 # def compression(bits) -> str:
@@ -223,12 +219,12 @@ convert symbols to message
 sps = 3
 N = 16
 P = Pam()
+Q = Qam()
 # symb = P.digital_modulation(bit_array, N)
 # symb = np.asarray(symb)  # Ensure it's a NumPy array
 # print(len(symb))
 
-constellation = get_qam_constellation(M=N)
-symb, padding = qam_mapper(bit_array,constellation)
+symb = Q.modulate(bit_array, N)
 
 
 transmit_signal = P.create_message(symb, sps)
@@ -238,32 +234,14 @@ print(type(transmit_signal))
 print(transmit_signal)
 chunk_size = 8000
 num_chunks = int(np.ceil(len(transmit_signal) / chunk_size))
-all_received = []
 
+# chunks go through the radio one at a time, transmit then capture; the signal is already
+# fully modulated, so the engine adds back pressure and timing stats but no speedup
 print(f"\nTransmitting {num_chunks} chunks...")
-for i in range(num_chunks):
-    start = i * chunk_size
-    end = min(start + chunk_size, len(transmit_signal))
-    chunk = transmit_signal[start:end]
-
-    print(f"Transmitting chunk {i + 1}/{num_chunks} (length = {len(chunk)})")
-    system.transmit_signal(chunk)
-    # time.sleep(0.5)  
-
-    received = system.receive_signal()
-    print(f"Received chunk {i + 1} length: {len(received)}")
-    all_received.append(received)
-
-    # plt.figure(figsize=(12, 10))
-    # plt.subplot(2, 1, 1)
-    # plt.plot(np.real(chunk), color="blue", marker="o", label="Real Transmit")
-    # plt.plot(np.real(received), color="red", label="Real Receive")
-    # plt.title("Transmit and Receive Signals (Real)")
-    # plt.xlabel("Time Samples")
-    # plt.ylabel("Amplitude")
-    # plt.grid(True)
-    # plt.legend()
-    # plt.show()
+engine = TxRxEngine(system)
+all_received = engine.run(transmit_signal, chunk_size)
+stats = engine.stats()
+print(f"Sent {stats['chunks']} chunks in {stats['seconds']:.2f} s ({stats['tx_samples_per_sec']:.0f} samples/sec)")
 
 receive_signal = np.concatenate(all_received)
 print(f"Total received signal length: {len(receive_signal)}")
@@ -284,7 +262,6 @@ plt.legend()
 # s = np.asarray(s)
 
 rx_symbols = receive_signal[sps//2::sps]
-rx_symb = demod_nearest(rx_symbols, constellation)
 
 #unperm = np.argsort(perm)
 #unshuffled_symbols = s[unperm]
@@ -292,7 +269,7 @@ rx_symb = demod_nearest(rx_symbols, constellation)
 
 
 
-rx_bit_array = qam_demapper(rx_symb,padding,constellation)
+rx_bit_array = Q.demodulate(rx_symbols, N, len(bit_array))
 
 b = rx_bit_array
 
@@ -357,21 +334,9 @@ apply low pass filter to reduce noise in the audio
 
 
 
-def bits_to_audio(bit_array, levels):
-    # Convert each 8-bit string back to int
-    
-    int_levels = np.array([int(b, 2) for b in bit_array], dtype=np.int32)
-
-    # Map from [0, 255] → [-1, 1] (inverse of quantization step)
-    audio = (int_levels / (levels - 1)) * 2 - 1
-
-    return audio.astype(np.float32)
-
-
 levels = 256  # bits = 8
 
-bit_strs = [''.join(str(bit) for bit in b[i:i+8]) for i in range(0, len(b), 8)]
-reconstructed_audio = bits_to_audio(bit_strs, levels) 
+reconstructed_audio = bits_to_audio(BitBuffer.from_bits(b), levels)
 
 
 '''
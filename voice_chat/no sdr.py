@@ -5,28 +5,23 @@ import matplotlib.animation as animation
 from pynput import keyboard as kb
 import threading
 import time
+from bitbuffer import BitBuffer
+from quantizer import quantize, audio_to_bits, bits_to_audio
+from ring_buffer import RingBuffer
                                                                
 # Settings
 fs = 44100
 chunk = 1024                          
 bits = 8
 levels = 2**bits
+max_seconds = 60       # longest push-to-talk recording kept
 
 talk = threading.Event()
 recording_done = threading.Event()
 
 # Buffers
 live_buffer = np.zeros(chunk)
-recorded_audio = []
-
-# Quantization
-def quantize(signal, levels):
-    return np.round(signal * (levels // 2 - 1)) / (levels // 2 - 1)
-
-def audio_to_bits(buffer, levels):
-    quantized = quantize(buffer, levels)
-    int_levels = ((quantized + 1) / 2 * (levels - 1)).astype(int)
-    return [format(val, '08b') for val in int_levels]
+recorded_audio = RingBuffer(fs * max_seconds)
 
 # Plot setup
 fig, ax = plt.subplots()
@@ -62,12 +57,12 @@ def on_release(key):
 
 # Audio callback
 def audio_callback(indata, frames, time, status):
-    global live_buffer, recorded_audio
+    global live_buffer
     if status:
         print("Audio Status:", status)
     live_buffer[:] = indata[:, 0]
     if talk.is_set():
-        recorded_audio.append(indata.copy())
+        recorded_audio.write(indata)
 
 # Start listener
 print("Press and hold SPACE to record. Release to stop.")
@@ -90,15 +85,15 @@ listener.join()
 
 
 # Combine and convert audio
-if recorded_audio:
-    audio_clip = np.concatenate(recorded_audio, axis=0).flatten()
+if recorded_audio.available:
+    audio_clip = recorded_audio.read().flatten()
     bit_array = audio_to_bits(audio_clip, levels)
 
     # Output
     print(f"\nRecorded {len(audio_clip)/fs:.2f} seconds of audio")
-    print(f"Total bits captured: {len(bit_array)*bits}")
+    print(f"Total bits captured: {len(bit_array)}")
     print("First 10 audio samples as bits:")
-    print(bit_array[:20])
+    print(bit_array.bits[:20])
 else:
     print("\nNo audio was recorded. Make sure you press and hold the spacebar while the plot window is open.")
 
@@ -120,7 +115,7 @@ convert symbols to message
 sps = 3
 N = 4 
 P = Pam()
-symb = P.digital_modulation2(bit_array, N)
+symb = P.modulate(bit_array.data, N, packed=True)
 transmit_signal = P.create_message(symb, sps)
 
 
@@ -133,8 +128,8 @@ all_received = []
 
 
 s = P.decode_message(transmit_signal, sps, N)
-s = P.detect_pam_symbol(N, s)
-b = P.symbol_to_bits2(N, s)
+s = P.detect_pam_index(N, s)
+b = BitBuffer(P.symbols_to_bytes(N, s))
 
 print(f"Same signal received? {b == bit_array}")
 
@@ -146,17 +141,6 @@ convert bits back to audio
 apply low pass filter to reduce noise in the audio
 '''
 
-def bits_to_audio(bit_array, levels):
-    # Convert each 8-bit string back to int
-    int_levels = np.array([int(b, 2) for b in bit_array], dtype=np.int32)
-
-    # Map from [0, 255] → [-1, 1] (inverse of quantization step)
-    audio = (int_levels / (levels - 1)) * 2 - 1
-
-    return audio.astype(np.float32)
-
-
-
 def sinc_lpf(B, fs, num_taps):
     """Return a low-pass filter using a sinc function.
     
@@ -0,0 +1,238 @@
+# streaming voice pipeline: capture → quantize → source coding → modulation → pulse shaping → SDR
+import queue
+import threading
+import numpy as np
+from PAM import Pam
+from dpcm import DpcmEncoder
+from instrument import NULL
+from pulse_shaping import rrc_taps, PolyphaseInterpolator
+from quantizer import audio_to_bits
+from ring_buffer import RingBuffer
+
+# marks the end of the stream on every queue
+_END = object()
+
+
+class _Failure:
+    # carries an exception from a stage to the end of the pipeline
+    def __init__(self, error):
+        self.error = error
+
+
+class StreamingPipeline:
+    '''
+    Sends audio while the user is still talking. Every captured block goes through the whole
+    chain on its own and is handed to the radio as soon as it is shaped, so latency no longer
+    grows with the length of the utterance.
+
+    Each stage runs on its own thread and the stages are connected by bounded queues. A slow
+    radio fills the queues and the stages wait (back pressure); only the audio callback never
+    waits, it writes into a RingBuffer and blocks that do not fit are counted in the ring's overruns.
+
+    An exception in a stage or in transmit travels down the queues; every thread after it just
+    drains its queue until the end of the stream, and close() raises the exception.
+    '''
+
+    def __init__(self, transmit, levels=256, N=4, sps=3, block_size=1024, compression=True,
+                 compander=None, mapper=None, queue_size=8, max_seconds=10, fs=44100, instrument=NULL,
+                 rolloff=None, bits_per_symbol=None, framer=None):
+        '''
+        Parameters:
+        transmit: called with every block of transmit samples, e.g. system.transmit_signal
+        levels (int): quantization levels
+        N (int): number of PAM levels used by the default mapper
+        sps (int): samples per symbol
+        block_size (int): audio frames per block
+        compression (bool): DPCM encode the samples before modulation. DPCM works on whole 8 bit
+                            samples, so it needs levels = 256 and no compander.
+        compander (Compander): companding quantizer, see quantizer.audio_to_bits
+        mapper: called with a 0/1 bit array whose length is a multiple of bits_per_symbol,
+                returns the symbols. Defaults to Pam.modulate with N levels.
+        queue_size (int): blocks each queue holds before the stage feeding it waits
+        max_seconds (float): capture ring size
+        fs (int): audio sample rate
+        instrument (Instrumentation): times every stage, disabled by default
+        rolloff (float): shape with a root raised cosine of this rolloff instead of square pulses,
+                         the filter state carries from block to block
+        bits_per_symbol (int): bits the mapper turns into one symbol, required with a custom mapper
+                               so partial symbols are held back until the next block
+        framer (Framer): send every block as a frame (preamble, header, symbols) with the block
+                         number as its sequence number, so a receiver can find the blocks with
+                         Framer.find and tell which ones it missed. Square pulses only.
+        '''
+        if compression and (levels != 256 or compander is not None):
+            raise ValueError("DPCM compression needs 8 bit linear samples (levels = 256, no compander), "
+                             "pass compression=False.")
+        self.transmit = transmit
+        self.levels = levels
+        self.sps = sps
+        self.block_size = block_size
+        self.compander = compander
+        self.instrument = instrument
+        self.P = Pam()
+        if mapper is None:
+            self.bits_per_symbol = self.P.bits_per_symbol(N)
+            mapper = lambda bits: self.P.modulate(bits, N)
+        else:
+            if bits_per_symbol is None:
+                raise ValueError("A custom mapper needs bits_per_symbol, e.g. 6 for Qam().modulate(bits, 64).")
+            self.bits_per_symbol = bits_per_symbol
+        self.mapper = mapper
+        self.encoder = DpcmEncoder() if compression else None
+        self.shaper = None if rolloff is None else PolyphaseInterpolator(rrc_taps(sps, rolloff), sps)
+        if framer is not None and (framer.sps != sps or rolloff is not None):
+            raise ValueError("The framer must use the pipeline's sps and square pulses (rolloff=None).")
+        self.framer = framer
+        self.frames_built = 0
+
+        self.ring = RingBuffer(int(fs * max_seconds))
+        self.ready = threading.Event()
+        self.closed = False
+        self.leftover = np.zeros(0, dtype=np.uint8)
+        self.blocks_sent = 0
+        self.error = None
+
+        stages = [("quantize", self._quantize), ("encode", self._encode),
+                  ("modulate", self._modulate), ("shape", self._shape)]
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+        self.threads = [threading.Thread(target=self._capture, daemon=True)]
+        for i, (name, stage) in enumerate(stages):
+            self.threads.append(threading.Thread(target=self._run_stage, daemon=True,
+                                                 args=(name, stage, self.queues[i], self.queues[i + 1])))
+        self.threads.append(threading.Thread(target=self._send, daemon=True))
+
+
+    def start(self):
+        for t in self.threads:
+            t.start()
+
+
+    def push(self, indata):
+        '''
+        Hand captured frames to the pipeline. Safe to call from the audio callback.
+        '''
+        self.ring.write(indata)
+        self.ready.set()
+
+
+    def close(self):
+        '''
+        Stop capturing, send whatever is still in flight and wait until the radio has it all.
+        Raises the first exception a stage or the radio raised.
+        '''
+        self.closed = True
+        self.ready.set()
+        for t in self.threads:
+            t.join()
+        self.instrument.count("capture_overruns", self.ring.overruns)
+        self.instrument.flush()
+        if self.error is not None:
+            raise self.error
+
+
+    def _capture(self):
+        out = self.queues[0]
+        while True:
+            self.ready.wait()
+            self.ready.clear()
+            closed = self.closed
+            while self.ring.available >= self.block_size or (closed and self.ring.available):
+                t = self.instrument.start()
+                block = self.ring.read(self.block_size)[:, 0]
+                self.instrument.stop("capture", t)
+                out.put(block)
+            if closed:
+                out.put(_END)
+                return
+
+
+    def _run_stage(self, name, stage, inq, outq):
+        failed = False
+        while True:
+            item = inq.get()
+            if isinstance(item, _Failure):
+                failed = True
+                outq.put(item)
+                continue
+            if not failed:
+                try:
+                    t = self.instrument.start()
+                    result = stage(item)
+                    self.instrument.stop(name, t)
+                except Exception as e:
+                    # pass the error on, then only drain so the stages before this one never block
+                    failed = True
+                    outq.put(_Failure(e))
+                else:
+                    if result is not None and len(result):
+                        outq.put(result)
+            if item is _END:
+                outq.put(_END)
+                return
+
+
+    def _quantize(self, block):
+        if block is _END:
+            return None
+        return audio_to_bits(block, self.levels, self.compander)
+
+
+    def _encode(self, buf):
+        # a 0/1 bit array either way; BitBuffer.bits drops the pad bits of a partial last byte
+        if self.encoder is None:
+            return None if buf is _END else buf.bits
+        if buf is _END:
+            return np.unpackbits(self.encoder.flush())
+        return np.unpackbits(self.encoder.encode(buf.data))
+
+
+    def _modulate(self, data):
+        if data is _END:
+            # pad the last partial symbol with zeros
+            if not self.leftover.size:
+                return None
+            pad = -self.leftover.size % self.bits_per_symbol
+            bits = np.concatenate((self.leftover, np.zeros(pad, dtype=np.uint8)))
+            self.leftover = bits[:0]
+            return self.mapper(bits)
+
+        bits = np.concatenate((self.leftover, data))
+        usable = bits.size - bits.size % self.bits_per_symbol
+        self.leftover = bits[usable:]
+        return self.mapper(bits[:usable])
+
+
+    def _shape(self, symbols):
+        if self.shaper is not None:
+            return self.shaper.flush() if symbols is _END else self.shaper.process(symbols)
+        if symbols is _END:
+            return None
+        if self.framer is not None:
+            seq = self.frames_built % 2**16
+            self.frames_built += 1
+            return self.framer.build(symbols, seq)
+        return self.P.create_message(symbols, self.sps)
+
+
+    def _send(self):
+        inq = self.queues[-1]
+        while True:
+            # the radio finished the last block before the next one was ready
+            if self.blocks_sent and inq.empty():
+                self.instrument.count("tx_underruns")
+            samples = inq.get()
+            if samples is _END:
+                return
+            if isinstance(samples, _Failure):
+                self.error = self.error or samples.error
+                continue
+            if self.error is not None:
+                continue
+            t = self.instrument.start()
+            try:
+                self.transmit(samples)
+            except Exception as e:
+                self.error = e
+                continue
+            self.instrument.stop("sdr_tx", t)
+            self.blocks_sent += 1
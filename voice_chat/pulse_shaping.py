@@ -0,0 +1,130 @@
+# root raised cosine pulse shaping: polyphase transmit interpolator and receive matched filter
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def rrc_taps(sps, rolloff=0.35, span=8):
+    '''
+    Parameters:
+    sps (int): samples per symbol
+    rolloff (float): excess bandwidth, 0 < rolloff <= 1
+    span (int): filter length in symbols
+
+    Returns:
+    h (np.ndarray): span * sps + 1 taps with unit energy, so a TX filter followed by the
+                    matched RX filter gives a symbol peak of 1 and no intersymbol interference
+    '''
+    if not 0 < rolloff <= 1:
+        raise ValueError("rolloff must be in (0, 1].")
+    t = np.arange(-span * sps / 2, span * sps / 2 + 1) / sps
+    b = rolloff
+    h = np.empty(t.size)
+
+    zero = np.isclose(t, 0)
+    special = np.isclose(np.abs(t), 1 / (4 * b))
+    normal = ~(zero | special)
+    tn = t[normal]
+    h[normal] = ((np.sin(np.pi * tn * (1 - b)) + 4 * b * tn * np.cos(np.pi * tn * (1 + b)))
+                 / (np.pi * tn * (1 - (4 * b * tn) ** 2)))
+    h[zero] = 1 - b + 4 * b / np.pi
+    h[special] = b / np.sqrt(2) * ((1 + 2 / np.pi) * np.sin(np.pi / (4 * b))
+                                   + (1 - 2 / np.pi) * np.cos(np.pi / (4 * b)))
+    return h / np.sqrt(np.sum(h**2))
+
+
+class PolyphaseInterpolator:
+    '''
+    Upsample symbols by sps and filter them in one step.
+
+    Output sample n * sps + p only needs the phase p taps h[p::sps], so the whole block is one
+    (symbols, taps per phase) window matrix times a (taps per phase, sps) tap matrix. The last
+    symbols are kept between calls, so a stream can be fed block by block.
+    '''
+
+    def __init__(self, taps, sps):
+        '''
+        Parameters:
+        taps (np.ndarray): filter taps at the output rate
+        sps (int): samples per symbol (interpolation factor)
+        '''
+        self.sps = sps
+        K = -(-len(taps) // sps)
+        h = np.zeros(K * sps)
+        h[:len(taps)] = taps
+        # row k holds the taps applied to the symbol k steps back
+        self.H = h.reshape(K, sps)
+        self.state = np.zeros(K - 1, dtype=np.complex128)
+
+
+    def process(self, symbols):
+        '''
+        Parameters:
+        symbols (np.ndarray): the next symbols
+
+        Returns:
+        np.ndarray: len(symbols) * sps samples
+        '''
+        x = np.concatenate((self.state, np.asarray(symbols, dtype=np.complex128)))
+        K = self.H.shape[0]
+        if K > 1:
+            self.state = x[-(K - 1):]
+        windows = sliding_window_view(x, K)[:, ::-1]
+        return (windows @ self.H).ravel()
+
+
+    def flush(self):
+        '''
+        Returns:
+        np.ndarray: the tail of the last pulses
+        '''
+        return self.process(np.zeros(self.H.shape[0] - 1))
+
+
+class MatchedFilter:
+    '''
+    Receive filter followed by decimation to one sample per symbol. Only the kept samples are
+    computed, as one strided window matrix times the taps. Samples not yet used are carried to the
+    next call, so the receive buffer can be fed in blocks of any size.
+    '''
+
+    def __init__(self, taps, sps, delay=None):
+        '''
+        Parameters:
+        taps (np.ndarray): filter taps, normally the same RRC taps as the transmitter
+        sps (int): samples per symbol
+        delay (int): sample index of the first symbol peak at the filter output. Defaults to
+                     len(taps) - 1, the peak of the first symbol after the TX and RX filters.
+        '''
+        self.h = np.asarray(taps)[::-1]
+        self.sps = sps
+        L = len(self.h)
+        # filter history starts as zeros, buf[0] is stream sample base
+        self.buf = np.zeros(L - 1, dtype=np.complex128)
+        self.base = -(L - 1)
+        self.next_t = L - 1 if delay is None else delay
+
+
+    def process(self, samples):
+        '''
+        Parameters:
+        samples (np.ndarray): the next received samples
+
+        Returns:
+        np.ndarray: filtered symbol samples that are complete so far
+        '''
+        L = len(self.h)
+        self.buf = np.concatenate((self.buf, np.asarray(samples, dtype=np.complex128)))
+        first = self.next_t - self.base - (L - 1)
+        if first < 0:
+            # the requested sample lies before the data kept, skip ahead to the first one we can make
+            first += -(-(-first) // self.sps) * self.sps
+        if len(self.buf) - L < first:
+            return np.zeros(0, dtype=np.complex128)
+        windows = sliding_window_view(self.buf, L)[first::self.sps]
+        out = windows @ self.h
+
+        consumed = first + len(out) * self.sps
+        self.next_t = self.base + consumed + (L - 1)
+        self.buf = self.buf[consumed:]
+        self.base += consumed
+        return out
@@ -0,0 +1,160 @@
+# quantization of audio to packed bits and back
+import numpy as np
+from bitbuffer import BitBuffer
+
+
+def quantize(signal, levels):
+    return np.round(signal * (levels // 2 - 1)) / (levels // 2 - 1)
+
+
+def audio_to_bits(buffer, levels, compander=None):
+    '''
+    Parameters:
+    buffer (np.ndarray): audio in [-1, 1]
+    levels (int): number of quantization levels, a power of two
+    compander (Compander): quantize with this companding law instead of uniformly
+
+    Returns:
+    BitBuffer: log2(levels) bits per sample, packed
+    '''
+    if compander is not None:
+        return compander.audio_to_bits(buffer)
+    width = int(levels).bit_length() - 1
+    quantized = quantize(np.asarray(buffer, dtype=np.float64), levels)
+    int_levels = ((quantized + 1) / 2 * (levels - 1)).astype(int)
+    int_levels = np.clip(int_levels, 0, levels - 1)
+    return BitBuffer.from_samples(int_levels, width)
+
+
+def bits_to_audio(bit_array, levels, compander=None):
+    '''
+    Parameters:
+    bit_array: a BitBuffer from audio_to_bits, or an array of integer levels
+    levels (int): number of quantization levels
+    compander (Compander): the compander given to audio_to_bits, if any
+
+    Returns:
+    audio (np.ndarray): float32 audio in [-1, 1]
+    '''
+    if compander is not None:
+        return compander.bits_to_audio(bit_array)
+    if isinstance(bit_array, BitBuffer):
+        int_levels = bit_array.samples(int(levels).bit_length() - 1)
+    else:
+        int_levels = np.asarray(bit_array)
+
+    # Map from [0, levels - 1] → [-1, 1] (inverse of quantization step)
+    audio = (int_levels / (levels - 1)) * 2 - 1
+
+    return audio.astype(np.float32)
+
+
+class Compander:
+    '''
+    μ-law / A-law companding quantizer. Small amplitudes get finer steps than loud ones, so speech
+    stays intelligible at 4 - 8 bits per sample where the linear quantize needs 8.
+    Encoding and decoding are single table lookups.
+    '''
+
+    # resolution of the input grid the encode table is built on
+    GRID = 2**16
+
+    def __init__(self, law="mu", bits=8, mu=255.0, A=87.6):
+        '''
+        Parameters:
+        law (str): "mu" or "a"
+        bits (int): bits per sample, 4 to 8
+        mu (float): μ-law parameter
+        A (float): A-law parameter
+        '''
+        if law not in ("mu", "a"):
+            raise ValueError("law must be 'mu' or 'a'.")
+        if not 4 <= bits <= 8:
+            raise ValueError("Compander supports 4 to 8 bits per sample.")
+        self.law = law
+        self.bits = bits
+        self.levels = 2**bits
+        self.mu = mu
+        self.A = A
+
+        grid = np.linspace(-1, 1, self.GRID + 1)
+        self.encode_lut = self._code(self.compress(grid))
+        codes = np.arange(self.levels)
+        self.decode_lut = self.expand(codes / (self.levels - 1) * 2 - 1).astype(np.float32)
+
+
+    def compress(self, x):
+        '''
+        Parameters:
+        x (np.ndarray): audio in [-1, 1]
+
+        Returns:
+        np.ndarray: the companded signal in [-1, 1]
+        '''
+        ax = np.abs(x)
+        if self.law == "mu":
+            y = np.log1p(self.mu * ax) / np.log1p(self.mu)
+        else:
+            lnA = 1 + np.log(self.A)
+            y = np.where(ax < 1 / self.A, self.A * ax / lnA,
+                         (1 + np.log(np.maximum(self.A * ax, 1))) / lnA)
+        return np.sign(x) * y
+
+
+    def expand(self, y):
+        '''
+        Parameters:
+        y (np.ndarray): companded signal in [-1, 1]
+
+        Returns:
+        np.ndarray: audio in [-1, 1], the inverse of compress
+        '''
+        ay = np.abs(y)
+        if self.law == "mu":
+            x = np.expm1(ay * np.log1p(self.mu)) / self.mu
+        else:
+            lnA = 1 + np.log(self.A)
+            x = np.where(ay < 1 / lnA, ay * lnA / self.A, np.exp(ay * lnA - 1) / self.A)
+        return np.sign(y) * x
+
+
+    def _code(self, y):
+        return np.rint((y + 1) / 2 * (self.levels - 1)).astype(np.uint8)
+
+
+    def encode(self, signal):
+        '''
+        Parameters:
+        signal (np.ndarray): audio in [-1, 1], values outside are clipped
+
+        Returns:
+        codes (np.ndarray): np.uint8 codes in [0, 2**bits)
+        '''
+        x = np.clip(np.asarray(signal, dtype=np.float32), -1, 1)
+        grid = np.rint((x + 1) * (self.GRID / 2)).astype(np.intp)
+        return self.encode_lut[grid]
+
+
+    def decode(self, codes):
+        '''
+        Parameters:
+        codes (np.ndarray): codes from encode
+
+        Returns:
+        audio (np.ndarray): float32 audio in [-1, 1]
+        '''
+        return self.decode_lut[np.asarray(codes, dtype=np.intp)]
+
+
+    def quantize(self, signal):
+        return self.decode(self.encode(signal))
+
+
+    def audio_to_bits(self, buffer):
+        return BitBuffer.from_samples(self.encode(buffer), self.bits)
+
+
+    def bits_to_audio(self, bit_array):
+        if isinstance(bit_array, BitBuffer):
+            bit_array = bit_array.samples(self.bits)
+        return self.decode(bit_array)
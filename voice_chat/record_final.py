@@ -7,32 +7,34 @@ import threading
 import time
 import librosa
 from PAM import Pam
+from QAM import Qam
+from bitbuffer import BitBuffer
+from quantizer import quantize, audio_to_bits, bits_to_audio
+from ring_buffer import RingBuffer
+from txrx import TxRxEngine
+from sim_sdr import SimulatedSDR
+from instrument import Instrumentation
+from framing import Framer
+from link_adapt import MODES, LinkAdapter
 from comms_lib.pluto import Pluto
 from comms_lib.system import DigitalCommSystem
 
-from comms_lib.dsp import *
-
 # Settings
 fs = 44100               
 chunk = 1024                          
 bits = 8
 levels = 2**bits
+max_seconds = 60       # longest push-to-talk recording kept
+inst = Instrumentation("session_metrics.jsonl")   # per stage latency, enabled=False turns it off
+compander = None        # e.g. quantizer.Compander("mu", bits=6) to send 6 bit μ-law samples instead
 
 talk = threading.Event()
 recording_done = threading.Event()
 
 # Buffers
 live_buffer = np.zeros(chunk)
-recorded_audio = []
-
-# Quantization
-def quantize(signal, levels):
-    return np.round(signal * (levels // 2 - 1)) / (levels // 2 - 1)
+recorded_audio = RingBuffer(fs * max_seconds)
 
-def audio_to_bits(buffer, levels):
-    quantized = quantize(buffer, levels)
-    int_levels = ((quantized + 1) / 2 * (levels - 1)).astype(int)
-    return [format(val, '08b') for val in int_levels]   
 
 fig, ax = plt.subplots()
 x = np.arange(chunk)
@@ -67,12 +69,12 @@ def on_release(key):
 
 # Audio callback
 def audio_callback(indata, frames, time, status):
-    global live_buffer, recorded_audio
+    global live_buffer
     if status:
         print("Audio Status:", status)
     live_buffer[:] = indata[:, 0]
     if talk.is_set():
-        recorded_audio.append(indata.copy())
+        recorded_audio.write(indata)
 
 # Start listener
 print("Press and hold SPACE to record. Release to stop.")
@@ -95,17 +97,16 @@ listener.join()
 
 
 # Combine and convert audio
-if recorded_audio:
-    audio_clip = np.concatenate(recorded_audio, axis=0).flatten()
-    # bit_array = audio_to_bits(audio_clip, levels)
-    bit_strs = audio_to_bits(audio_clip, levels)
-    bit_array = np.array([int(b) for bits in bit_strs for b in bits], dtype=int)
-    print("Length of bit array: ", len(bit_array))
+if recorded_audio.available:
+    audio_clip = recorded_audio.read().flatten()
+    with inst.span("coding"):
+        bit_buf = audio_to_bits(audio_clip, levels, compander)
+    print("Length of bit array: ", len(bit_buf))
     # Output
     print(f"\nRecorded {len(audio_clip)/fs:.2f} seconds of audio")
-    print(f"Total bits captured: {len(bit_array)*bits}")
+    print(f"Total bits captured: {len(bit_buf)}")
     print("First 10 audio samples as bits:")
-    print(bit_array[:20])
+    print(np.unpackbits(bit_buf.data[:3])[:20])
 else:
     print("\nNo audio was recorded. Make sure you press and hold the spacebar while the plot window is open.")
 
@@ -166,7 +167,11 @@ T = ts * sps  # time between data symbols (seconds per symbol)
 # ---------------------------------------------------------------
 # Initialize transmitter and receiver.
 # ---------------------------------------------------------------
-sdr = Pluto("usb:2.7.5")  # change to your Pluto device
+simulate = False  # True runs the whole chain through sim_sdr.SimulatedSDR, no Pluto needed
+if simulate:
+    sdr = SimulatedSDR(fs=fs, seed=0)
+else:
+    sdr = Pluto("usb:2.7.5")  # change to your Pluto device
 tx = sdr
 # tx.tx_gain = 90  # set the transmitter gain         (power)
 
@@ -175,7 +180,7 @@ rx = tx
 # Uncomment the line below to use different Pluto devices for tx and rx
 # rx.rx_gain = 60  # set the receiver gain
 # sdr.carrier_frequency=840e6                       
-system = DigitalCommSystem()
+system = sdr if simulate else DigitalCommSystem()
 system.set_transmitter(tx)
 system.set_receiver(rx)
 system.set_carrier_frequency(890e6)
@@ -201,49 +206,39 @@ convert bits to symbols (map to constellation of PAM level 256)
 convert symbols to message
 '''
 sps = 3
-N = 16
 P = Pam()
+Q = Qam()
+
+# choose the QAM order from the preamble SNR of a probe frame; this path has no FEC, so only the
+# uncoded modes are candidates, and 4-QAM is kept if no probe frame is found
+framer = Framer(sps)
+adapter = LinkAdapter(modes=tuple(mode for mode in MODES if mode.rate == 1))
+with inst.span("link_probe"):
+    system.transmit_signal(framer.build(np.ones(64), seq=0))
+    probes = framer.find(system.receive_signal())
+if probes:
+    adapter.update(float(np.median([frame.snr for frame in probes])))
+N = adapter.modes[adapter.mode].M
+print(f"Probe SNR {adapter.snr_db:.1f} dB, sending {N}-QAM" if probes else f"No probe frame received, sending {N}-QAM")
 # symb = P.digital_modulation(bit_array, N)
 # symb = np.asarray(symb)  # Ensure it's a NumPy array
 # print(len(symb))
 
-constellation = get_qam_constellation(M=N)
-symb, padding = qam_mapper(bit_array,constellation)
-
-
-transmit_signal = P.create_message(symb, sps)
+with inst.span("modulation"):
+    symb = Q.modulate(bit_buf.data, N, packed=True)
+    transmit_signal = P.create_message(symb, sps)
 
 print("Transmit signal length:", len(transmit_signal))
-print(type(transmit_signal))
-print(transmit_signal)
 chunk_size = 8000
 num_chunks = int(np.ceil(len(transmit_signal) / chunk_size))
-all_received = []
 
+# chunks go through the radio one at a time, transmit then capture; the signal is already
+# fully modulated, so the engine adds back pressure and timing stats but no speedup
 print(f"\nTransmitting {num_chunks} chunks...")
-for i in range(num_chunks):
-    start = i * chunk_size
-    end = min(start + chunk_size, len(transmit_signal))
-    chunk = transmit_signal[start:end]
-
-    print(f"Transmitting chunk {i + 1}/{num_chunks} (length = {len(chunk)})")
-    system.transmit_signal(chunk)
-    # time.sleep(0.5)  
-
-    received = system.receive_signal()
-    print(f"Received chunk {i + 1} length: {len(received)}")
-    all_received.append(received)
-
-    # plt.figure(figsize=(12, 10))
-    # plt.subplot(2, 1, 1)
-    # plt.plot(np.real(chunk), color="blue", marker="o", label="Real Transmit")
-    # plt.plot(np.real(received), color="red", label="Real Receive")
-    # plt.title("Transmit and Receive Signals (Real)")
-    # plt.xlabel("Time Samples")
-    # plt.ylabel("Amplitude")
-    # plt.grid(True)
-    # plt.legend()
-    # plt.show()
+engine = TxRxEngine(system, instrument=inst)
+all_received = engine.run(transmit_signal, chunk_size)
+stats = engine.stats()
+print(f"Sent {stats['chunks']} chunks in {stats['seconds']:.2f} s ({stats['tx_samples_per_sec']:.0f} samples/sec)")
 
 receive_signal = np.concatenate(all_received)
 print(f"Total received signal length: {len(receive_signal)}")
@@ -263,8 +258,9 @@ plt.legend()
 # s = P.detect_pam_symbol(N, s)
 # s = np.asarray(s)
 
-rx_symbols = receive_signal[sps//2::sps]
-rx_symb = demod_nearest(rx_symbols, constellation)
+with inst.span("demodulation"):
+    rx_symbols = receive_signal[sps//2::sps]
+    rx_bit_array = Q.demodulate(rx_symbols, N, len(bit_buf))
 
 #unperm = np.argsort(perm)
 #unshuffled_symbols = s[unperm]
@@ -272,8 +268,6 @@ rx_symb = demod_nearest(rx_symbols, constellation)
 
 
 
-rx_bit_array = qam_demapper(rx_symb,padding,constellation)
-
 b = rx_bit_array
 
 
@@ -337,21 +331,9 @@ apply low pass filter to reduce noise in the audio
 
 
 
-def bits_to_audio(bit_array, levels):
-    # Convert each 8-bit string back to int
-    
-    int_levels = np.array([int(b, 2) for b in bit_array], dtype=np.int32)
-
-    # Map from [0, 255] → [-1, 1] (inverse of quantization step)
-    audio = (int_levels / (levels - 1)) * 2 - 1
-
-    return audio.astype(np.float32)
-
-
 levels = 256  # bits = 8
 
-bit_strs = [''.join(str(bit) for bit in b[i:i+8]) for i in range(0, len(b), 8)]
-reconstructed_audio = bits_to_audio(bit_strs, levels) 
+reconstructed_audio = bits_to_audio(BitBuffer.from_bits(b), levels, compander)
 
 
 '''
@@ -374,6 +356,11 @@ shifted = librosa.effects.pitch_shift(reconstructed_audio, sr=44100, n_steps=n_s
          
 # playback the audio
 print("Playing recieved audio...")
-sd.play(shifted, samplerate=44100)
-sd.wait()
+with inst.span("playback"):
+    sd.play(shifted, samplerate=44100)
+    sd.wait()
+
+inst.flush()
+for stage, st in inst.summary()["stages"].items():
+    print(f"{stage:>14}: p50 {st['p50'] * 1e3:.2f} ms, p99 {st['p99'] * 1e3:.2f} ms ({st['count']} calls)")
 
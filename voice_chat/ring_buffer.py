@@ -0,0 +1,114 @@
+# preallocated capture buffer shared between the audio callback and the main thread
+import numpy as np
+
+
+class RingBuffer:
+    '''
+    Fixed size single producer / single consumer ring of audio frames.
+
+    The producer (the PortAudio callback) only copies into the preallocated array and then moves
+    the write counter, the consumer only reads up to that counter and then moves the read counter.
+    Each counter has one writer, so no lock is needed and the callback never waits or allocates.
+    When the ring is full new frames are dropped and counted in overruns.
+    '''
+
+    def __init__(self, capacity, channels=1, dtype=np.float32):
+        '''
+        Parameters:
+        capacity (int): number of frames the ring holds
+        channels (int): samples per frame
+        dtype: np.float32 or np.int16. int16 stores float input clipped to [-1, 1] and scaled to
+               full range.
+        '''
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float32, np.int16):
+            raise ValueError("RingBuffer stores np.float32 or np.int16 frames.")
+        self.buffer = np.zeros((capacity, channels), dtype=self.dtype)
+        self.capacity = capacity
+        self.scale = 32767 if self.dtype == np.int16 else 1
+        self.written = 0    # total frames written, only the producer changes it
+        self.consumed = 0   # total frames read, only the consumer changes it
+        self.overruns = 0
+        # int16 mode clips here first; grown to the largest block once, so later writes never allocate
+        self.scratch = np.zeros((0, channels), dtype=np.float32)
+
+
+    @property
+    def available(self):
+        return self.written - self.consumed
+
+
+    def _store(self, dst, src):
+        if self.scale == 1:
+            np.copyto(dst, src, casting="same_kind")
+        else:
+            if len(self.scratch) < len(src):
+                self.scratch = np.zeros((len(src), self.buffer.shape[1]), dtype=np.float32)
+            tmp = self.scratch[:len(src)]
+            # out of range input would wrap around in the int16 cast
+            np.clip(src, -1, 1, out=tmp)
+            np.multiply(tmp, self.scale, out=dst, casting="unsafe")
+
+
+    def write(self, block):
+        '''
+        Producer side, safe to call from the audio callback.
+
+        Parameters:
+        block (np.ndarray): (frames, channels) block, e.g. indata
+        '''
+        n = len(block)
+        free = self.capacity - (self.written - self.consumed)
+        if n > free:
+            self.overruns += n - free
+            n = free
+        start = self.written % self.capacity
+        first = min(n, self.capacity - start)
+        self._store(self.buffer[start:start + first], block[:first])
+        self._store(self.buffer[:n - first], block[first:n])
+        # publish only after the data is in place
+        self.written += n
+
+
+    def peek(self, n=None):
+        '''
+        Consumer side, zero copy.
+
+        Parameters:
+        n (int): number of frames to look at, defaults to all available
+
+        Returns:
+        views (list): one or two views into the ring (two when the frames wrap around the end)
+        '''
+        n = self.available if n is None else min(n, self.available)
+        start = self.consumed % self.capacity
+        first = min(n, self.capacity - start)
+        views = [self.buffer[start:start + first]]
+        if n > first:
+            views.append(self.buffer[:n - first])
+        return views
+
+
+    def consume(self, n):
+        '''
+        Release n frames after the views from peek are no longer needed.
+        '''
+        self.consumed += min(n, self.available)
+
+
+    def read(self, n=None):
+        '''
+        Copy out and consume frames.
+
+        Parameters:
+        n (int): number of frames, defaults to all available
+
+        Returns:
+        frames (np.ndarray): (n, channels) float32 frames in [-1, 1]
+        '''
+        views = self.peek(n)
+        frames = np.concatenate(views).astype(np.float32)
+        if self.scale != 1:
+            frames /= self.scale
+        self.consume(len(frames))
+        return frames
@@ -0,0 +1,122 @@
+# Reed-Solomon RS(255, k) byte coding with a block interleaver, for compressed payloads like MP3
+import galois
+import numpy as np
+
+
+def interleave(codewords, depth):
+    '''
+    Send depth codewords column by column, so a burst of b bad bytes puts at most
+    ceil(b / depth) errors in any one codeword.
+
+    Parameters:
+    codewords (np.ndarray): (C, n) codewords, C a multiple of depth
+
+    Returns:
+    np.ndarray: the C * n bytes in transmission order
+    '''
+    C, n = codewords.shape
+    return codewords.reshape(C // depth, depth, n).transpose(0, 2, 1).ravel()
+
+
+def deinterleave(data, depth, n):
+    '''
+    Returns:
+    np.ndarray: (C, n) codewords from interleave's output
+    '''
+    return data.reshape(-1, n, depth).transpose(0, 2, 1).reshape(-1, n)
+
+
+class RsCodec:
+    '''
+    Systematic RS(255, k) over GF(2^8): every codeword holds k data bytes and corrects up to
+    (255 - k) // 2 byte errors. Bytes are coded many codewords per call as (codewords, k) arrays,
+    and only codewords whose syndrome is not zero go through the decoder.
+
+    Attributes:
+    corrected (int): byte errors corrected so far
+    failures (int): codewords with too many errors to correct, passed on as received
+    '''
+
+    def __init__(self, k=223, depth=8, batch=4096):
+        '''
+        Parameters:
+        k (int): data bytes per codeword, sets the code rate k / 255. 223 corrects 16 bytes,
+                 191 corrects 32.
+        depth (int): interleaver depth in codewords, 1 turns interleaving off
+        batch (int): codewords handed to galois at once, bounds the memory used
+        '''
+        if not 0 < k < 255 or (255 - k) % 2:
+            raise ValueError("k must be below 255 and leave an even number of parity bytes.")
+        self.n = 255
+        self.k = k
+        self.depth = depth
+        self.batch = batch
+        self.rs = galois.ReedSolomon(self.n, k)
+        self.corrected = 0
+        self.failures = 0
+
+
+    @property
+    def rate(self):
+        return self.k / self.n
+
+
+    def coded_length(self, n_bytes):
+        '''
+        Returns:
+        int: bytes encode produces for n_bytes of data
+        '''
+        codewords = -(-n_bytes // self.k)
+        return -(-codewords // self.depth) * self.depth * self.n
+
+
+    def encode(self, data):
+        '''
+        Parameters:
+        data (bytes | np.ndarray): payload bytes
+
+        Returns:
+        np.ndarray: uint8 coded and interleaved bytes, coded_length(len(data)) long. The payload
+                    is padded with zeros to whole interleaver blocks.
+        '''
+        data = np.frombuffer(data, dtype=np.uint8) if isinstance(data, (bytes, bytearray)) \
+            else np.asarray(data, dtype=np.uint8).ravel()
+        rows = self.coded_length(data.size) // self.n
+        messages = np.zeros((rows, self.k), dtype=np.uint8)
+        messages.ravel()[:data.size] = data
+
+        codewords = np.empty((rows, self.n), dtype=np.uint8)
+        for first in range(0, rows, self.batch):
+            codewords[first:first + self.batch] = self.rs.encode(messages[first:first + self.batch])
+        return interleave(codewords, self.depth)
+
+
+    def decode(self, coded, n_bytes):
+        '''
+        Parameters:
+        coded (bytes | np.ndarray): received bytes, cut or zero padded to coded_length(n_bytes)
+        n_bytes (int): payload length
+
+        Returns:
+        np.ndarray: uint8 payload with the correctable errors fixed
+        '''
+        coded = np.frombuffer(coded, dtype=np.uint8) if isinstance(coded, (bytes, bytearray)) \
+            else np.asarray(coded, dtype=np.uint8).ravel()
+        length = self.coded_length(n_bytes)
+        received = np.zeros(length, dtype=np.uint8)
+        received[:min(coded.size, length)] = coded[:length]
+        codewords = deinterleave(received, self.depth, self.n)
+
+        # systematic code: the data bytes are the first k of every codeword
+        messages = codewords[:, :self.k].copy()
+        for first in range(0, len(codewords), self.batch):
+            block = codewords[first:first + self.batch]
+            dirty = np.flatnonzero(self.rs.detect(block))
+            if dirty.size == 0:
+                continue
+            fixed, errors = self.rs.decode(block[dirty], errors=True)
+            ok = errors >= 0
+            messages[first + dirty[ok]] = np.asarray(fixed)[ok]
+            self.corrected += int(errors[ok].sum())
+            self.failures += int((~ok).sum())
+        return messages.ravel()[:n_bytes]
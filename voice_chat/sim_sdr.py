@@ -0,0 +1,116 @@
+# software stand-in for the Pluto, so the modem can run without hardware
+import numpy as np
+
+
+class SimulatedSDR:
+    '''
+    In-process loopback radio with the same controls as comms_lib's Pluto and DigitalCommSystem.
+
+    Like the Pluto, a transmitted buffer is repeated cyclically and every receive_signal call
+    captures rx_buffer_size samples of it starting at a random point. On the way it is hit by
+    a fractional timing offset, gain, a random carrier phase, carrier frequency offset, phase noise
+    and AWGN. Everything is generated from one seed so a run can be reproduced exactly.
+    '''
+
+    # tuning range of the AD9363
+    FREQ_RANGE = (325e6, 3.8e9)
+
+    def __init__(self, fs=10e6, noise_std=0.01, cfo=0.0, phase_noise_std=0.0, timing_offset=None,
+                 random_start=True, gain_jitter_db=0.0, path_loss_db=120.0, seed=None):
+        '''
+        Parameters:
+        fs (float): baseband sample rate
+        noise_std (float): standard deviation of the complex AWGN (per real dimension)
+        cfo (float): carrier frequency offset in Hz
+        phase_noise_std (float): standard deviation of the random walk phase noise, radians per sample
+        timing_offset (float): fractional delay in samples, None picks a new random one per capture
+        random_start (bool): start each capture at a random point of the cyclic TX buffer
+        gain_jitter_db (float): standard deviation of a random gain change per capture
+        path_loss_db (float): the channel gain is tx_gain + rx_gain - path_loss_db (dB). The default
+                              gains (90 and 30 dB, what the scripts set on the Pluto) make it 0 dB.
+        seed (int): seed for all random effects
+        '''
+        self.fs = fs
+        self.noise_std = noise_std
+        self.cfo = cfo
+        self.phase_noise_std = phase_noise_std
+        self.timing_offset = timing_offset
+        self.random_start = random_start
+        self.gain_jitter_db = gain_jitter_db
+        self.path_loss_db = path_loss_db
+        self.rng = np.random.default_rng(seed)
+
+        self.tx_gain = 90
+        self.rx_gain = 30
+        self.rx_buffer_size = 10000
+        self.carrier_frequency = 915e6
+        self.tx_buffer = None
+        self.transmitter = self
+        self.receiver = self
+
+
+    def __repr__(self):
+        return (f"SimulatedSDR(fs={self.fs:g}, carrier_frequency={self.carrier_frequency:g}, "
+                f"tx_gain={self.tx_gain}, rx_gain={self.rx_gain}, rx_buffer_size={self.rx_buffer_size})")
+
+
+    def set_transmitter(self, tx):
+        self.transmitter = tx
+
+
+    def set_receiver(self, rx):
+        self.receiver = rx
+
+
+    def set_carrier_frequency(self, fc):
+        if not self.FREQ_RANGE[0] <= fc <= self.FREQ_RANGE[1]:
+            raise ValueError(f"Carrier frequency {fc:g} Hz is outside the Pluto range.")
+        self.transmitter.carrier_frequency = fc
+        self.receiver.carrier_frequency = fc
+
+
+    def transmit_signal(self, signal):
+        '''
+        Parameters:
+        signal (np.ndarray): baseband samples, sent cyclically until the next transmit
+        '''
+        signal = np.asarray(signal, dtype=np.complex64).ravel()
+        if signal.size == 0:
+            raise ValueError("Cannot transmit an empty signal.")
+        self.transmitter.tx_buffer = signal
+
+
+    def receive_signal(self):
+        '''
+        Returns:
+        rx (np.ndarray): rx_buffer_size complex64 samples of what is on the air
+        '''
+        tx, rx = self.transmitter, self.receiver
+        n = int(rx.rx_buffer_size)
+        rng = self.rng
+
+        if tx.tx_buffer is None:
+            signal = np.zeros(n, dtype=np.complex128)
+        else:
+            buf = tx.tx_buffer.astype(np.complex128)
+
+            # fractional delay is exact for a cyclic buffer: a linear phase across the FFT bins
+            tau = rng.uniform(0, 1) if self.timing_offset is None else self.timing_offset
+            if tau:
+                f = np.fft.fftfreq(buf.size)
+                buf = np.fft.ifft(np.fft.fft(buf) * np.exp(-2j * np.pi * f * tau))
+
+            start = rng.integers(buf.size) if self.random_start else 0
+            signal = buf[(start + np.arange(n)) % buf.size]
+
+            gain_db = tx.tx_gain + rx.rx_gain - self.path_loss_db
+            if self.gain_jitter_db:
+                gain_db += rng.normal(0, self.gain_jitter_db)
+            t = np.arange(n)
+            phase = rng.uniform(0, 2 * np.pi) + 2 * np.pi * self.cfo / self.fs * t
+            if self.phase_noise_std:
+                phase += np.cumsum(rng.normal(0, self.phase_noise_std, n))
+            signal = signal * (10 ** (gain_db / 20) * np.exp(1j * phase))
+
+        noise = rng.normal(0, self.noise_std, (2, n))
+        return (signal + noise[0] + 1j * noise[1]).astype(np.complex64)
@@ -0,0 +1,100 @@
+# soft decision demapping: max-log bit LLRs for any labelled constellation, the front end of soft FEC
+import numpy as np
+
+
+class LlrDemapper:
+    '''
+    Max-log LLR of bit j of a received symbol y:
+
+        LLR_j = (min over points with bit j = 1 of |y - s|^2  -  min over points with bit j = 0 of |y - s|^2) / N0
+
+    positive when the bit is more likely 0, the convention fec.viterbi_decode expects.
+
+    The points carrying a 0 and a 1 in every bit position are found once. When every bit is
+    decided by one axis alone (PAM, and square QAM with a Gray code per axis) the minimum over a
+    subset of points equals the minimum over that axis' levels, so the distances are taken per
+    axis: sqrt(M) levels per symbol instead of M points.
+    '''
+
+    def __init__(self, constellation, table=None):
+        '''
+        Parameters:
+        constellation (np.ndarray): the M points
+        table (np.ndarray): (M, L) 0/1 array, row i holds the bits (msb first) carried by point i,
+                            e.g. Pam.bit_table(N, gray=True). Defaults to the binary index of each point.
+        '''
+        points = np.asarray(constellation, dtype=np.complex64).ravel()
+        M = points.size
+        if table is None:
+            L = max(M - 1, 1).bit_length()
+            table = (np.arange(M)[:, None] >> np.arange(L - 1, -1, -1)) & 1
+        table = np.asarray(table, dtype=np.uint8)
+        if table.shape[0] != M:
+            raise ValueError(f"The bit table has {table.shape[0]} rows for {M} points.")
+        self.points = points
+        self.table = table
+        self.bits = table.shape[1]
+
+        # (L, M/2) point indices with the bit at 0 and at 1
+        self.zeros = np.array([np.flatnonzero(table[:, j] == 0) for j in range(self.bits)])
+        self.ones = np.array([np.flatnonzero(table[:, j] == 1) for j in range(self.bits)])
+
+        # per axis: the levels and, for the bits that axis decides, the level indices with the bit at 0 / 1
+        self.axes = []
+        for part in (np.real, np.imag):
+            levels, where = np.unique(part(points), return_inverse=True)
+            self.axes.append([levels.astype(np.float32), where, []])
+        self.separable = all(self._axis_subsets(j) for j in range(self.bits))
+
+
+    def _axis_subsets(self, j):
+        # True, and the axis subsets of bit j stored, if bit j only depends on one axis
+        for levels, where, subsets in self.axes:
+            bit = np.full(levels.size, -1)
+            for level, b in zip(where, self.table[:, j]):
+                if bit[level] not in (-1, b):
+                    break
+                bit[level] = b
+            else:
+                subsets.append((j, np.flatnonzero(bit == 0), np.flatnonzero(bit == 1)))
+                return True
+        return False
+
+
+    def demap(self, y, noise_var=1.0, chunk=65536):
+        '''
+        Parameters:
+        y (np.ndarray): received symbols, gain and phase corrected
+        noise_var (float): N0, the complex noise variance per symbol. Only scales the LLRs, so any
+                           positive value gives the same hard decisions and Viterbi path.
+        chunk (int): symbols per pass, bounds the (chunk, levels) distance arrays
+
+        Returns:
+        np.ndarray: (len(y), L) float32 LLRs, ravel() gives them in transmitted bit order
+        '''
+        y = np.asarray(y).ravel()
+        out = np.empty((y.size, self.bits), dtype=np.float32)
+        scale = np.float32(1 / noise_var)
+        for first in range(0, y.size, chunk):
+            block = y[first:first + chunk]
+            rows = out[first:first + chunk]
+            if self.separable:
+                for (levels, _, subsets), part in zip(self.axes, (np.real, np.imag)):
+                    if not subsets:
+                        continue
+                    d = (part(block).astype(np.float32)[:, None] - levels[None, :]) ** 2
+                    for j, zero, one in subsets:
+                        rows[:, j] = (d[:, one].min(axis=1) - d[:, zero].min(axis=1)) * scale
+            else:
+                d = np.abs(block.astype(np.complex64)[:, None] - self.points[None, :]) ** 2
+                for j in range(self.bits):
+                    rows[:, j] = (d[:, self.ones[j]].min(axis=1) - d[:, self.zeros[j]].min(axis=1)) * scale
+        return out
+
+
+    def hard(self, y):
+        '''
+        Returns:
+        np.ndarray: (len(y), L) uint8 hard bit decisions, the signs of the LLRs
+        '''
+        return (self.demap(y) < 0).astype(np.uint8)
@@ -0,0 +1,90 @@
+import sounddevice as sd
+from pynput import keyboard as kb
+import threading
+from framing import Framer
+from pipeline import StreamingPipeline
+from comms_lib.pluto import Pluto
+from comms_lib.system import DigitalCommSystem
+
+'''
+streaming version of record_final.py
+
+every 1024 sample block is quantized, compressed, modulated and shaped as soon as it is captured
+and handed to the Pluto while the user is still holding the spacebar
+
+every block goes out as a framing.Framer frame whose sequence number is the block number, so a
+receiver finds the blocks with Framer.find and sees a gap in the sequence numbers for every block
+it missed
+
+limitation: DigitalCommSystem.transmit_signal loads the Pluto's cyclic TX buffer, and every call
+replaces the one before it. On real hardware the air therefore carries the latest frame repeated
+until the next one arrives, not one continuous stream: the receiver gets repeats (same sequence
+number, drop them) and loses the frames that were replaced before it captured them. A gapless
+stream needs the Pluto in non-cyclic TX mode, which comms_lib does not expose.
+'''
+
+# Settings
+fs = 44100
+chunk = 1024
+bits = 8
+levels = 2**bits
+sps = 3
+N = 4
+
+talk = threading.Event()
+recording_done = threading.Event()
+
+# ---------------------------------------------------------------
+# Initialize transmitter and receiver.
+# ---------------------------------------------------------------
+sdr = Pluto("usb:2.7.5")  # change to your Pluto device
+system = DigitalCommSystem()
+system.set_transmitter(sdr)
+system.set_receiver(sdr)
+system.set_carrier_frequency(890e6)
+system.transmitter.tx_gain = 90
+system.receiver.rx_gain = 30
+system.receiver.rx_buffer_size = int(2.5e5)
+
+pipeline = StreamingPipeline(system.transmit_signal, levels=levels, N=N, sps=sps, block_size=chunk, fs=fs,
+                             framer=Framer(sps))
+pipeline.start()
+
+# Keyboard handlers
+def on_press(key):
+    if key == kb.Key.space and not talk.is_set():
+        print("Streaming started...")
+        talk.set()
+
+def on_release(key):
+    if key == kb.Key.space and talk.is_set():
+        print("Streaming stopped.")
+        talk.clear()
+        recording_done.set()
+        return False
+
+# Audio callback
+def audio_callback(indata, frames, time, status):
+    if status:
+        print("Audio Status:", status)
+    if talk.is_set():
+        pipeline.push(indata)
+
+# Start listener
+print("Press and hold SPACE to talk. Release to stop.")
+listener = kb.Listener(on_press=on_press, on_release=on_release)
+listener.start()
+
+# Start audio stream
+stream = sd.InputStream(callback=audio_callback, channels=1, samplerate=fs, blocksize=chunk)
+stream.start()
+
+recording_done.wait()
+
+# Cleanup
+stream.stop()
+stream.close()
+listener.join()
+
+pipeline.close()
+print(f"Sent {pipeline.blocks_sent} blocks, {pipeline.ring.overruns} frames dropped")
@@ -0,0 +1,106 @@
+# symbol timing recovery: Gardner detector with a cubic Farrow interpolator, updated at block rate
+import numpy as np
+
+
+def farrow_cubic(x, t):
+    '''
+    Cubic Lagrange interpolation of x at fractional positions t, written in Farrow form.
+
+    Parameters:
+    x (np.ndarray): samples
+    t (np.ndarray): positions, 1 <= t < len(x) - 2
+
+    Returns:
+    np.ndarray: interpolated values
+    '''
+    i = np.floor(t).astype(np.intp)
+    mu = t - i
+    xm1, x0, x1, x2 = x[i - 1], x[i], x[i + 1], x[i + 2]
+    c3 = (x2 - xm1) / 6 + (x0 - x1) / 2
+    c2 = (xm1 + x1) / 2 - x0
+    c1 = x1 - x0 / 2 - xm1 / 3 - x2 / 6
+    return ((c3 * mu + c2) * mu + c1) * mu + x0
+
+
+class TimingRecovery:
+    '''
+    Finds the best sampling instant and follows clock drift, so the receiver no longer needs a
+    fixed receive_signal[sps//2::sps] phase.
+
+    The loop runs at block rate: for a block of symbols the strobe times are laid out with the
+    current timing estimate, all symbols and midpoints are interpolated at once, and the mean
+    Gardner error of the block updates a proportional-integral loop. The carried state (timing,
+    period and the last symbol) lets long captures be fed in pieces.
+    '''
+
+    def __init__(self, sps=2, block=32, kp=0.1, ki=0.001):
+        '''
+        Parameters:
+        sps (float): nominal samples per symbol, 2 or more
+        block (int): symbols per loop update
+        kp (float): proportional gain, in samples per unit of normalized error
+        ki (float): integral gain, follows a clock rate offset
+        '''
+        self.sps = sps
+        self.block = block
+        self.kp = kp
+        self.ki = ki
+        self.period = float(sps)
+        self.tau = 1.0          # position of the next strobe in buf
+        self.buf = np.zeros(0, dtype=np.complex128)
+        self.last = None        # previous symbol, for the error of the next block's first symbol
+
+
+    def process(self, samples):
+        '''
+        Parameters:
+        samples (np.ndarray): matched filter output at about sps samples per symbol
+
+        Returns:
+        symbols (np.ndarray): complex symbols at the recovered instants
+        errors (np.ndarray): mean timing error of every block, the timing error trace
+        '''
+        self.buf = np.concatenate((self.buf, np.asarray(samples, dtype=np.complex128)))
+        symbols = []
+        errors = []
+        B = self.block
+        while True:
+            k = np.arange(B)
+            t = self.tau + k * self.period
+            # every strobe and the midpoint before it must be interpolatable
+            if t[-1] + 2 >= len(self.buf) or t[0] - self.period / 2 < 1:
+                if t[0] - self.period / 2 < 1:
+                    self.tau += self.period
+                    continue
+                # not enough samples for a whole block, take what fits
+                fits = np.flatnonzero(t + 2 < len(self.buf))
+                if fits.size == 0:
+                    break
+                k = k[:fits[-1] + 1]
+                t = t[k]
+
+            y = farrow_cubic(self.buf, t)
+            mid = farrow_cubic(self.buf, t - self.period / 2)
+            prev = np.concatenate(([y[0] if self.last is None else self.last], y[:-1]))
+
+            # Gardner: the midpoint sits on the zero crossing when the strobes are on the peaks
+            e = np.real(np.conj(mid) * (y - prev))
+            power = np.mean(np.abs(y) ** 2)
+            err = float(np.mean(e) / power) if power > 0 else 0.0
+
+            self.period += -self.ki * err
+            self.tau = t[-1] + self.period - self.kp * err
+            self.last = y[-1]
+            symbols.append(y)
+            errors.append(err)
+            if len(k) < B:
+                break
+
+        # drop samples no future strobe will need
+        drop = max(int(np.floor(self.tau - self.period)) - 2, 0)
+        self.buf = self.buf[drop:]
+        self.tau -= drop
+
+        if not symbols:
+            return np.zeros(0, dtype=np.complex128), np.zeros(0)
+        return np.concatenate(symbols), np.array(errors)
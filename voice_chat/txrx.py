@@ -0,0 +1,191 @@
+# concurrent transmit / receive of chunked signals through a DigitalCommSystem
+import queue
+import threading
+import time
+from instrument import NULL
+
+_END = object()
+
+
+class _Failure:
+    # carries an exception from a worker thread to the caller
+    def __init__(self, error):
+        self.error = error
+
+
+class TxRxEngine:
+    '''
+    Runs TX submission and RX capture on two worker threads.
+
+    TX and RX strictly alternate on the radio: the next chunk is only submitted after the current
+    one has been captured, because a new transmit replaces the Pluto's cyclic TX buffer. What runs
+    in parallel with the radio is the caller's own work: chunks are submitted through a queue of
+    depth 2 and received chunks come back through another, so the caller can produce chunk i+1 and
+    process received chunk i while chunk i is on the air. run() with a signal that is already fully
+    modulated leaves no such work, so it is no faster than a plain transmit / receive loop.
+
+    If the radio raises (e.g. the USB link drops), the workers stop touching it, keep draining the
+    queues so nothing waits forever, and the error is raised again from received() / run().
+    '''
+
+    def __init__(self, system, depth=2, instrument=NULL):
+        '''
+        Parameters:
+        system: anything with transmit_signal(chunk) and receive_signal(), e.g. DigitalCommSystem
+        depth (int): chunks buffered on each side of the radio
+        instrument (Instrumentation): times every transmit and receive, disabled by default
+        '''
+        self.system = system
+        self.instrument = instrument
+        self.tx_queue = queue.Queue(maxsize=depth)
+        self.rx_queue = queue.Queue(maxsize=depth)
+        self.on_air = queue.Queue(maxsize=1)
+        self.radio_free = threading.Semaphore(1)
+        self.samples_tx = 0
+        self.samples_rx = 0
+        self.chunks = 0
+        self.start_time = None
+        self.stop_time = None
+        self.error = None
+        self.lock = threading.Lock()
+        self.threads = [threading.Thread(target=self._tx_worker, daemon=True),
+                        threading.Thread(target=self._rx_worker, daemon=True)]
+
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        for t in self.threads:
+            t.start()
+
+
+    def submit(self, chunk):
+        '''
+        Queue a chunk for transmission, waits while both buffers are full.
+        '''
+        self.tx_queue.put(chunk)
+
+
+    def finish(self):
+        '''
+        No more chunks will be submitted.
+        '''
+        self.tx_queue.put(_END)
+
+
+    def received(self):
+        '''
+        Yields the received chunks in order until finish has been called and everything is captured.
+        Raises the radio's exception if a transmit or receive failed.
+        '''
+        while True:
+            item = self.rx_queue.get()
+            if isinstance(item, _Failure):
+                raise item.error
+            if item is _END:
+                for t in self.threads:
+                    t.join()
+                return
+            yield item
+
+
+    def run(self, signal, chunk_size):
+        '''
+        Send signal in chunks and collect what was received for each one.
+
+        Parameters:
+        signal (np.ndarray): the whole transmit signal
+        chunk_size (int): samples per chunk
+
+        Returns:
+        all_received (list): the received buffer of every chunk
+        '''
+        def feed():
+            for start in range(0, len(signal), chunk_size):
+                self.submit(signal[start:start + chunk_size])
+            self.finish()
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        self.start()
+        feeder.start()
+        all_received = list(self.received())
+        feeder.join()
+        return all_received
+
+
+    def _fail(self, error):
+        # report only the first error, the caller stops reading after it
+        with self.lock:
+            first = self.error is None
+            if first:
+                self.error = error
+        if first:
+            self.rx_queue.put(_Failure(error))
+
+
+    def _tx_worker(self):
+        while True:
+            chunk = self.tx_queue.get()
+            if chunk is _END:
+                self.on_air.put(_END)
+                return
+            if self.error is not None:
+                # drop the rest so submit never waits on a dead radio
+                continue
+            # wait until the previous chunk has been captured
+            self.radio_free.acquire()
+            if self.error is not None:
+                self.radio_free.release()
+                continue
+            if self.chunks and self.tx_queue.empty():
+                self.instrument.count("tx_underruns")
+            t = self.instrument.start()
+            try:
+                self.system.transmit_signal(chunk)
+            except Exception as e:
+                self.radio_free.release()
+                self._fail(e)
+                continue
+            self.instrument.stop("sdr_tx", t)
+            self.samples_tx += len(chunk)
+            self.on_air.put(chunk)
+
+
+    def _rx_worker(self):
+        while True:
+            item = self.on_air.get()
+            if item is _END:
+                self.stop_time = time.perf_counter()
+                if self.error is None:
+                    self.rx_queue.put(_END)
+                return
+            if self.error is not None:
+                self.radio_free.release()
+                continue
+            t = self.instrument.start()
+            try:
+                received = self.system.receive_signal()
+            except Exception as e:
+                self.radio_free.release()
+                self._fail(e)
+                continue
+            self.instrument.stop("sdr_rx", t)
+            self.radio_free.release()
+            self.samples_rx += len(received)
+            self.chunks += 1
+            self.rx_queue.put(received)
+
+
+    def stats(self):
+        '''
+        Returns:
+        dict: chunks, samples sent / received and the sustained transmit rate in samples per second
+        '''
+        end = self.stop_time if self.stop_time is not None else time.perf_counter()
+        elapsed = end - self.start_time if self.start_time is not None else 0.0
+        return {
+            "chunks": self.chunks,
+            "samples_tx": self.samples_tx,
+            "samples_rx": self.samples_rx,
+            "seconds": elapsed,
+            "tx_samples_per_sec": self.samples_tx / elapsed if elapsed else 0.0,
+        }